@@ -1,25 +1,231 @@
 # aia/agents/memory_agent.py
-from typing import Optional
+import asyncio
+import math
+import re
+import time
+from typing import Optional, List, Dict
+
+from openai import AsyncOpenAI
+from sqlalchemy import select, insert
+
+from db import AsyncSessionLocal
+from models import Student, LongMemory
+from cache import TTLCache
+from logger import log_info, log_warn
 from aia.orchestrator.state import SessionState
+from aia.tokens import CHARS_PER_TOKEN, truncate_to_tokens
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_MODEL_TEXT,
+    SESSION_SUMMARY_TOKENS,
+    STUDENT_CONTEXT_MEMORIES,
+    MEMORY_CACHE_SIZE,
+    MEMORY_CACHE_TTL_S,
+    MEMORY_CANDIDATES,
+    MEMORY_HALF_LIFE_DAYS,
+)
+
+_SUMMARY_PROMPT = (
+    "Você mantém o resumo de uma sessão de tutoria por voz. "
+    "Atualize o resumo anterior com as novas mensagens, em português do Brasil, "
+    "em no máximo {max_words} palavras. Guarde o que importa para continuar a aula: "
+    "tópicos vistos, dúvidas e dificuldades do aluno, combinados e próximos passos."
+)
+
+
+# ==========================================
+# MEMÓRIA DE LONGO PRAZO (long_memory)
+# ==========================================
+# Cache por aluno, compartilhado entre as reconexões dele (Wi-Fi da escola cai
+# muito): student_id -> {"profile": dict, "memories": [(criado_em_ts, texto)]}
+# com as MEMORY_CANDIDATES memórias mais recentes, da mais nova para a mais antiga.
+_memory_cache = TTLCache(maxsize=MEMORY_CACHE_SIZE, ttl=MEMORY_CACHE_TTL_S)
+
+# Buscas em andamento: reconexões simultâneas do mesmo aluno esperam a mesma consulta
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Peso da recência em relação à relevância por palavras-chave
+RECENCY_WEIGHT = 0.5
+
+_words = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = {
+    "que", "com", "para", "por", "uma", "um", "dos", "das", "nos", "nas",
+    "não", "mais", "como", "mas", "foi", "ele", "ela", "seu", "sua", "são",
+    "está", "tem", "ter", "isso", "esse", "essa", "muito", "também", "quando",
+}
+
+
+def _keywords(text: str) -> set:
+    return {
+        w for w in _words.findall((text or "").lower())
+        if len(w) > 2 and w not in _STOPWORDS
+    }
+
+
+def rank_memories(memories, query: str = "", k: int = STUDENT_CONTEXT_MEMORIES,
+                  now: float = None) -> List[str]:
+    """
+    Ordena as memórias por relevância (fração das palavras-chave da memória
+    presentes na consulta) + recência (meia-vida de MEMORY_HALF_LIFE_DAYS).
+    Sem consulta, vale só a recência.
+    """
+    now = time.time() if now is None else now
+    query_words = _keywords(query)
+    scored = []
+    for created_at, text in memories:
+        age_days = max(now - created_at, 0) / 86400
+        recency = math.pow(0.5, age_days / MEMORY_HALF_LIFE_DAYS)
+        relevance = 0.0
+        if query_words:
+            words = _keywords(text)
+            if words:
+                relevance = len(words & query_words) / len(words)
+        scored.append((relevance + RECENCY_WEIGHT * recency, created_at, text))
+    scored.sort(reverse=True)
+    return [text for _, _, text in scored[:k]]
+
+
+async def _fetch_long_memory(student_id: str) -> dict:
+    async with AsyncSessionLocal() as db:
+        profile = await db.scalar(select(Student.profile).where(Student.id == student_id))
+        result = await db.execute(
+            select(LongMemory.created_at, LongMemory.memory)
+            .where(LongMemory.student_id == student_id)
+            .order_by(LongMemory.created_at.desc())
+            .limit(MEMORY_CANDIDATES)
+        )
+        memories = [
+            (created_at.timestamp() if created_at else time.time(), memory)
+            for created_at, memory in result
+        ]
+    entry = {"profile": profile or {}, "memories": memories}
+    _memory_cache.set(student_id, entry)
+    log_info(f"🧠 Memórias carregadas do banco para {student_id}", memories=len(memories))
+    return entry
+
+
+async def load_long_memory(student_id: str) -> dict:
+    """Perfil + memórias candidatas do aluno (cache -> consulta em andamento -> banco)."""
+    entry = _memory_cache.get(student_id)
+    if entry is not None:
+        return entry
+
+    task = _inflight.get(student_id)
+    if task is None:
+        task = asyncio.create_task(_fetch_long_memory(student_id))
+        _inflight[student_id] = task
+        task.add_done_callback(lambda _: _inflight.pop(student_id, None))
+    # shield: o timeout de uma conexão não cancela a consulta das outras
+    return await asyncio.shield(task)
+
+
+async def relevant_memories(student_id: str, query: str = "",
+                            k: int = STUDENT_CONTEXT_MEMORIES) -> List[str]:
+    entry = await load_long_memory(student_id)
+    return rank_memories(entry["memories"], query, k)
+
+
+async def remember(student_id: str, memory: str):
+    """Grava uma memória e atualiza o cache do aluno sem reconsultar o banco."""
+    async with AsyncSessionLocal() as db:
+        created_at = await db.scalar(
+            insert(LongMemory)
+            .values(student_id=student_id, memory=memory)
+            .returning(LongMemory.created_at)
+        )
+        await db.commit()
+
+    task = _inflight.get(student_id)
+    if task is not None:
+        # A consulta em andamento pode não ter visto a linha nova
+        await asyncio.shield(task)
+    entry = _memory_cache.get(student_id)
+    if entry is not None:
+        ts = created_at.timestamp() if created_at else time.time()
+        if (ts, memory) not in entry["memories"]:
+            entry["memories"].insert(0, (ts, memory))
+        del entry["memories"][MEMORY_CANDIDATES:]
+
+
+def invalidate_memory_cache(student_id: str):
+    _memory_cache.pop(student_id)
+
+
+def memory_cache_stats() -> dict:
+    return {**_memory_cache.stats(), "inflight": len(_inflight)}
 
 
 class MemoryAgent:
     """
-    Futuro agente de memória do AIA.
-    Por enquanto, apenas esqueleto para integração futura.
+    Agente de memória do AIA.
+
+    Mantém `conversation_summary` da sessão: as mensagens que saem do histórico
+    curto (SessionState.evicted_messages) são incorporadas ao resumo numa tarefa
+    em background, sem nunca bloquear o turno.
     """
 
     def __init__(self):
-        ...
+        self.client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL,
+        )
 
     async def load_profile(self, session: SessionState):
         """
-        Carregar perfil estendido do aluno (futuro).
+        Carrega o perfil e as memórias de longo prazo mais relevantes para a
+        lição atual em `session.profile` / `session.extra["long_memories"]`.
+        """
+        entry = await load_long_memory(session.student_id)
+        session.profile = {**entry["profile"], **session.profile}
+        session.extra["long_memories"] = rank_memories(
+            entry["memories"], session.current_lesson or ""
+        )
+
+    async def remember(self, session: SessionState, memory: str):
+        await remember(session.student_id, memory)
+
+    def schedule_summary(self, session: SessionState):
         """
-        return
+        Dispara (se ainda não houver) a tarefa que resume as mensagens despejadas.
+        """
+        task = session.extra.get("summary_task")
+        if session.evicted_messages and (task is None or task.done()):
+            session.extra["summary_task"] = asyncio.create_task(self._fold_evicted(session))
+
+    async def _fold_evicted(self, session: SessionState):
+        while session.evicted_messages:
+            batch = list(session.evicted_messages)
+            del session.evicted_messages[:len(batch)]
+            summary = await self.summarize(session.conversation_summary, batch)
+            await self.save_session_summary(session, summary)
+
+    async def summarize(self, previous: Optional[str], messages: List[Dict[str, str]]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        try:
+            resp = await self.client.chat.completions.create(
+                model=OPENAI_MODEL_TEXT,
+                messages=[
+                    {"role": "system", "content": _SUMMARY_PROMPT.format(max_words=SESSION_SUMMARY_TOKENS * 3 // 4)},
+                    {"role": "user", "content": f"Resumo anterior:\n{previous or '(vazio)'}\n\nNovas mensagens:\n{transcript}"},
+                ],
+            )
+            summary = (resp.choices[0].message.content or "").strip()
+        except Exception as e:
+            log_warn(f"Erro ao resumir sessão: {e}", event="session_summary")
+            # Sem LLM: mantém o texto bruto mais recente dentro do limite
+            summary = f"{previous or ''}\n{transcript}".strip()
+            max_chars = SESSION_SUMMARY_TOKENS * CHARS_PER_TOKEN
+            if len(summary) <= max_chars:
+                return summary
+            tail = summary[-max_chars:]
+            # Começa numa palavra inteira
+            return "…" + tail[tail.find(" ") + 1:] if " " in tail else tail
+
+        return truncate_to_tokens(summary, SESSION_SUMMARY_TOKENS)
 
     async def save_session_summary(self, session: SessionState, summary: str):
         """
-        Salvar resumo da sessão (futuro).
+        Salvar resumo da sessão.
         """
         session.conversation_summary = summary
@@ -0,0 +1,114 @@
+# aia/agents/prompt.py
+
+from functools import lru_cache
+from typing import Optional
+
+from aia.tokens import estimate_tokens, truncate_to_tokens
+from config import PROMPT_TOKEN_BUDGET, PROMPT_CACHE_SIZE
+
+
+def _clean(text: str) -> str:
+    return "\n".join(line.rstrip() for line in text.strip("\n").splitlines())
+
+
+# Prefixo pedagógico fixo: não depende do aluno, então é byte a byte igual em
+# todas as chamadas (o que deixa o cache de prefixo de prompt da OpenAI atuar).
+STATIC_PREFIX = _clean("""
+Você é o AGENTE TUTOR PESSOAL (ATP) do Ambiente Inteligente de Aprendizagem (AIA).
+
+Seu papel é atuar como um professor particular multimodal,
+falando com o aluno em voz, de forma clara, humana e estruturada.
+
+REGRAS GERAIS DE COMPORTAMENTO:
+1. Fale SEMPRE em português do Brasil, em tom amigável, respeitoso e motivador.
+2. Adapte o vocabulário ao nível do aluno (iniciante, intermediário ou avançado),
+   evitando jargões desnecessários quando perceber dificuldade.
+3. Comece entendendo o contexto: faça perguntas curtas para entender
+   o que o aluno já sabe e o que ele quer alcançar.
+4. Explique conceitos de forma progressiva:
+   - primeiro uma visão geral simples,
+   - depois detalhes,
+   - por fim, exemplos práticos.
+5. Use frases relativamente curtas, adequadas para voz,
+   com ritmo natural, evitando monólogos longos.
+6. Ao final de cada explicação, faça UMA pergunta de checagem,
+   para verificar se o aluno entendeu ou se deseja aprofundar.
+7. Nunca critique, nunca humilhe, nunca desmotive.
+   Corrija com cuidado e reforce que errar faz parte do aprendizado.
+8. Se o aluno parecer confuso, reduza a complexidade e use analogias.
+9. Se o aluno demonstrar domínio, aprofunde gradualmente o nível técnico,
+   inclusive utilizando matemática, fórmulas ou código quando adequado.
+10. Sempre mantenha o foco pedagógico: se o aluno desviar muito do tema,
+    traga gentilmente de volta ao objetivo principal.
+
+PARTICULARIDADES PARA INTERAÇÃO POR VOZ:
+- Suas respostas devem ser claras e objetivas, evitando parágrafos muito longos.
+- Quando estiver explicando algo mais complexo, quebre em passos concretos.
+- Leve em conta que o aluno pode interromper sua fala no meio (barge-in),
+  portanto mantenha cada bloco de explicação razoavelmente curto.
+""")
+
+STATIC_PREFIX_TOKENS = estimate_tokens(STATIC_PREFIX)
+
+# Abaixo disso não vale a pena manter um trecho cortado
+_MIN_SECTION_TOKENS = 30
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def render_prompt(
+    nome: str,
+    nivel: str,
+    objetivo: str,
+    summary: Optional[str],
+    lesson: Optional[str],
+    budget: int = PROMPT_TOKEN_BUDGET,
+) -> str:
+    """
+    Monta o prompt completo: prefixo fixo + seções dinâmicas do aluno.
+
+    Memoizado pela "impressão digital" do estado (os próprios argumentos).
+    Se passar do orçamento de tokens, as seções dinâmicas são cortadas por
+    prioridade: primeiro o resumo da conversa, depois a lição atual.
+    O perfil e o objetivo nunca são cortados.
+    """
+    profile = (
+        "PERFIL DO ALUNO:\n"
+        f"- Nome (quando conhecido): {nome}\n"
+        f"- Nível atual aproximado: {nivel}\n"
+        f"- Objetivo principal declarado: {objetivo}"
+    )
+    goal = (
+        "OBJETIVO GLOBAL:\n"
+        f"Ajudar {nome} a {objetivo}, com clareza, paciência, profundidade progressiva\n"
+        "e foco no desenvolvimento real de competências, não apenas memorização."
+    )
+
+    # (prioridade, rótulo, texto): maior prioridade = mantida por mais tempo
+    optional = []
+    if lesson:
+        optional.append((2, "Lição atual: ", lesson))
+    if summary:
+        optional.append((1, "Resumo recente da conversa: ", summary))
+
+    remaining = budget - STATIC_PREFIX_TOKENS - estimate_tokens(profile) - estimate_tokens(goal)
+    kept = {}
+    for priority, label, text in sorted(optional, reverse=True):
+        available = remaining - estimate_tokens(label)
+        if available < _MIN_SECTION_TOKENS:
+            continue
+        text = truncate_to_tokens(text, available)
+        kept[label] = text
+        remaining -= estimate_tokens(label) + estimate_tokens(text)
+
+    # Ordem fixa no texto final: lição antes do resumo
+    extra = "".join(
+        f"\n{label}{kept[label]}"
+        for label in ("Lição atual: ", "Resumo recente da conversa: ")
+        if label in kept
+    )
+
+    return _clean(f"{STATIC_PREFIX}\n\n{profile}{extra}\n\n{goal}")
+
+
+def prompt_cache_info():
+    return render_prompt.cache_info()
@@ -1,11 +1,15 @@
 # aia/agents/tutor.py
 
+import asyncio
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, AsyncIterator, Iterable
 
 from openai import AsyncOpenAI
 
 from aia.orchestrator.state import SessionState
+from aia.tts_cache import Audio, TTSCache, cache_key
+from aia.agents.prompt import render_prompt
+from logger import log_info, log_warn
 from config import (
     OPENAI_API_KEY,
     OPENAI_BASE_URL,
@@ -16,6 +20,9 @@ from config import (
 )
 
 
+FALLBACK_REPLY = "Desculpe, tive um problema técnico ao gerar a resposta. Podemos tentar novamente?"
+
+
 @dataclass
 class StudentProfile:
     nome: Optional[str] = None
@@ -30,7 +37,9 @@ class TutorAgent:
     Implementa:
     - transcribe_audio(audio_bytes)  -> texto do aluno
     - generate_reply(text, session)  -> resposta textual
-    - synthesize_voice(text)         -> áudio (bytes)
+    - stream_reply(text, session)    -> resposta textual em pedaços (stream)
+    - synthesize_voice(text)         -> áudio (bytes ou memoryview do cache), com cache por conteúdo
+    - warm_voice_cache(phrases)      -> pré-sintetiza frases repetidas
     - build_instructions(session)    -> prompt pedagógico completo
     """
 
@@ -40,6 +49,7 @@ class TutorAgent:
             api_key=OPENAI_API_KEY,
             base_url=OPENAI_BASE_URL,
         )
+        self.tts_cache = TTSCache()
 
     # -------------------------------------------------------
     # 1. STT - TRANSCRIÇÃO
@@ -69,14 +79,9 @@ class TutorAgent:
         Gera a resposta do tutor com base no texto do aluno e no estado da sessão.
         """
         try:
-            system_prompt = self.build_instructions(session)
-
             resp = await self.client.chat.completions.create(
                 model=OPENAI_MODEL_TEXT,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_text},
-                ],
+                messages=self.build_messages(user_text, session),
             )
 
             content = resp.choices[0].message.content or ""
@@ -86,87 +91,102 @@ class TutorAgent:
 
         except Exception as e:
             print("[TutorAgent] Erro ao gerar resposta:", e)
-            return "Desculpe, tive um problema técnico ao gerar a resposta. Podemos tentar novamente?"
+            return FALLBACK_REPLY
+
+    async def stream_reply(self, user_text: str, session: SessionState) -> AsyncIterator[str]:
+        """
+        Igual ao generate_reply, mas devolve os tokens à medida que o LLM gera.
+        """
+        produced = False
+        try:
+            stream = await self.client.chat.completions.create(
+                model=OPENAI_MODEL_TEXT,
+                messages=self.build_messages(user_text, session),
+                stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    produced = True
+                    yield delta
+
+        except Exception as e:
+            print("[TutorAgent] Erro ao gerar resposta (stream):", e)
+            if not produced:
+                yield FALLBACK_REPLY
+
+    def build_messages(self, user_text: str, session: SessionState) -> list:
+        """
+        Prompt do sistema + histórico curto da sessão + fala atual do aluno.
+        """
+        return [
+            {"role": "system", "content": self.build_instructions(session)},
+            *session.recent_messages,
+            {"role": "user", "content": user_text},
+        ]
 
     # -------------------------------------------------------
     # 3. TTS - SÍNTESE DE VOZ
     # -------------------------------------------------------
-    async def synthesize_voice(self, text: str) -> bytes:
+    async def synthesize_voice(self, text: str) -> Audio:
         """
         Converte a resposta textual em áudio usando o modelo de TTS configurado.
+        Frases repetidas (saudações, fallback de erro...) saem do cache; do
+        disco vêm como memoryview sobre o arquivo mapeado (sem cópia).
         """
+        key = cache_key(OPENAI_MODEL_TTS, OPENAI_TTS_VOICE, text)
+        cached = await self.tts_cache.lookup(key)
+        if cached is not None:
+            return cached
+
         try:
             speech = await self.client.audio.speech.create(
                 model=OPENAI_MODEL_TTS,
                 voice=OPENAI_TTS_VOICE,
                 input=text,
             )
-            # BinaryResponse -> convertemos para bytes
-            audio_bytes = bytes(speech)
-            return audio_bytes
+            # BinaryResponse -> conteúdo em bytes
+            audio_bytes = bytes(speech.content)
         except Exception as e:
             print("[TutorAgent] Erro ao sintetizar voz:", e)
             return b""
 
+        if audio_bytes:
+            try:
+                await self.tts_cache.store(key, audio_bytes)
+            except OSError as e:
+                log_warn(f"Erro ao gravar cache de voz: {e}", event="tts_cache")
+        return audio_bytes
+
+    async def warm_voice_cache(self, phrases: Iterable[str], concurrency: int = 4):
+        """
+        Sintetiza antecipadamente as frases que ainda não estão no cache.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(phrase: str):
+            async with semaphore:
+                await self.synthesize_voice(phrase)
+
+        await asyncio.gather(*(warm(p) for p in phrases if p.strip()))
+        log_info("🔊 Cache de voz aquecido", event="tts_cache_warm", **self.tts_cache.stats())
+
     # -------------------------------------------------------
     # 4. INSTRUÇÕES PEDAGÓGICAS COMPLETAS
     # -------------------------------------------------------
     def build_instructions(self, session: SessionState) -> str:
         """
         Recupera o prompt pedagógico completo, com o mesmo conteúdo que você usava antes.
+        O prefixo fixo é pré-compilado e o resultado fica memoizado por estado
+        da sessão (ver aia/agents/prompt.py), dentro de PROMPT_TOKEN_BUDGET.
         """
         nome = session.student_name or self.default_profile.nome or "aluno"
-        nivel = self.default_profile.nivel
-        objetivo = self.default_profile.objetivo
-
-        contexto_extra = ""
-        if session.conversation_summary:
-            contexto_extra += f"\nResumo recente da conversa: {session.conversation_summary}"
-        if session.current_lesson:
-            contexto_extra += f"\nLição atual: {session.current_lesson}"
-
-        base_instructions = f"""
-Você é o AGENTE TUTOR PESSOAL (ATP) do Ambiente Inteligente de Aprendizagem (AIA).
-
-Seu papel é atuar como um professor particular multimodal,
-falando com o aluno em voz, de forma clara, humana e estruturada.
-
-PERFIL DO ALUNO:
-- Nome (quando conhecido): {nome}
-- Nível atual aproximado: {nivel}
-- Objetivo principal declarado: {objetivo}
-{contexto_extra}
-
-REGRAS GERAIS DE COMPORTAMENTO:
-1. Fale SEMPRE em português do Brasil, em tom amigável, respeitoso e motivador.
-2. Adapte o vocabulário ao nível do aluno (iniciante, intermediário ou avançado),
-   evitando jargões desnecessários quando perceber dificuldade.
-3. Comece entendendo o contexto: faça perguntas curtas para entender
-   o que o aluno já sabe e o que ele quer alcançar.
-4. Explique conceitos de forma progressiva:
-   - primeiro uma visão geral simples,
-   - depois detalhes,
-   - por fim, exemplos práticos.
-5. Use frases relativamente curtas, adequadas para voz,
-   com ritmo natural, evitando monólogos longos.
-6. Ao final de cada explicação, faça UMA pergunta de checagem,
-   para verificar se o aluno entendeu ou se deseja aprofundar.
-7. Nunca critique, nunca humilhe, nunca desmotive.
-   Corrija com cuidado e reforce que errar faz parte do aprendizado.
-8. Se o aluno parecer confuso, reduza a complexidade e use analogias.
-9. Se o aluno demonstrar domínio, aprofunde gradualmente o nível técnico,
-   inclusive utilizando matemática, fórmulas ou código quando adequado.
-10. Sempre mantenha o foco pedagógico: se o aluno desviar muito do tema,
-    traga gentilmente de volta ao objetivo principal.
-
-PARTICULARIDADES PARA INTERAÇÃO POR VOZ:
-- Suas respostas devem ser claras e objetivas, evitando parágrafos muito longos.
-- Quando estiver explicando algo mais complexo, quebre em passos concretos.
-- Leve em conta que o aluno pode interromper sua fala no meio (barge-in),
-  portanto mantenha cada bloco de explicação razoavelmente curto.
-
-OBJETIVO GLOBAL:
-Ajudar {nome} a {objetivo}, com clareza, paciência, profundidade progressiva
-e foco no desenvolvimento real de competências, não apenas memorização.
-"""
-        return "\n".join(line.rstrip() for line in base_instructions.splitlines())
+        return render_prompt(
+            nome,
+            self.default_profile.nivel,
+            self.default_profile.objetivo,
+            session.conversation_summary,
+            session.current_lesson,
+        )
@@ -0,0 +1,103 @@
+# aia/embeddings.py
+
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+from openai import AsyncOpenAI
+
+from cache import TTLCache
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_MODEL_EMBEDDING,
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL_S,
+)
+
+# Dimensão da coluna vector(1536) do banco
+EMBEDDING_DIM = 1536
+
+
+class OpenAIEmbedder:
+    """Embeddings da API da OpenAI (uma requisição por lote de textos)."""
+
+    name = "openai"
+
+    def __init__(self, model: str = OPENAI_MODEL_EMBEDDING):
+        self.model = model
+        self.client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL,
+        )
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        resp = await self.client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in resp.data]
+
+
+class HashEmbedder:
+    """
+    Substituto local e determinístico (feature hashing de palavras).
+    Mesmo texto -> mesmo vetor; textos com palavras em comum ficam próximos.
+    Serve para testes e ingestão offline, não para qualidade de busca.
+    """
+
+    name = "hash"
+    _words = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _vector(self, text: str) -> List[float]:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in self._words.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vec[value % self.dim] += 1.0 if (value >> 63) else -1.0
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(t) for t in texts]
+
+
+_BACKENDS = {
+    "openai": OpenAIEmbedder,
+    "hash": HashEmbedder,
+}
+
+
+def get_embedder(name: str = EMBEDDING_BACKEND):
+    try:
+        return _BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"EMBEDDING_BACKEND desconhecido: {name}")
+
+
+_embedder = None
+
+# Perguntas repetidas (mesma dúvida, vários alunos) não pagam outra chamada
+_query_cache = TTLCache(maxsize=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL_S)
+
+
+def _default_embedder():
+    global _embedder
+    if _embedder is None:
+        _embedder = get_embedder()
+    return _embedder
+
+
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    return await _default_embedder().embed(texts)
+
+
+async def embed_query(text: str) -> List[float]:
+    key = " ".join(text.split()).lower()
+    vector = _query_cache.get(key)
+    if vector is None:
+        vector = (await embed_texts([key]))[0]
+        _query_cache.set(key, vector)
+    return vector
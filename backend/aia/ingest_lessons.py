@@ -0,0 +1,333 @@
+# aia/ingest_lessons.py
+"""
+Ingestão das lições em lesson_embeddings.
+
+    cd backend && python -m aia.ingest_lessons [--backend hash] [--lesson <uuid>]
+
+- Lê as lições em streaming (sem carregar a tabela inteira na memória).
+- Quebra o conteúdo em trechos por parágrafo, com sobreposição.
+- Cada trecho é identificado pelo sha256 do texto normalizado: trechos que já
+  existem para a lição são mantidos, os que sumiram são apagados, e só os novos
+  são enviados ao embedder. Rodar de novo sem mudanças não custa nenhuma chamada.
+- Trechos idênticos (na mesma lição, em outras lições ou já no banco) reaproveitam
+  o mesmo vetor.
+- Embeddings em lotes, com limite de requisições simultâneas; inserts em massa.
+- Commit a cada grupo de lições: se o processo cair, a próxima execução continua
+  de onde parou. As leituras e a gravação usam sessões curtas separadas: nenhuma
+  conexão fica parada numa transação durante as chamadas de embedding.
+- chunk_index reflete a ordem atual dos trechos, inclusive dos mantidos.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, delete, update, bindparam, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from db import AsyncSessionLocal
+from models import Lesson, LessonEmbedding
+from logger import log_info, log_error
+from aia.embeddings import get_embedder
+from aia.vector_index import lesson_index
+from config import (
+    EMBEDDING_BACKEND,
+    INGEST_CHUNK_CHARS,
+    INGEST_CHUNK_OVERLAP,
+    INGEST_EMBED_BATCH,
+    INGEST_EMBED_CONCURRENCY,
+)
+
+# Lições processadas (e commitadas) por vez
+LESSONS_PER_GROUP = 32
+
+_paragraphs = re.compile(r"\n\s*\n")
+_sentences = re.compile(r"(?<=[.!?])\s+")
+
+
+def normalize_chunk(text: str) -> str:
+    return " ".join(text.split())
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(normalize_chunk(text).encode("utf-8")).hexdigest()
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    """Parágrafo maior que max_chars: quebra por frase e, se preciso, no meio."""
+    pieces, current = [], ""
+    for sentence in _sentences.split(text):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, max_chars: int = INGEST_CHUNK_CHARS,
+               overlap: int = INGEST_CHUNK_OVERLAP) -> List[str]:
+    """
+    Junta parágrafos até max_chars. Cada trecho começa com o final
+    (até `overlap` caracteres) do anterior, para não cortar o contexto.
+    """
+    units = []
+    for paragraph in _paragraphs.split(text or ""):
+        paragraph = normalize_chunk(paragraph)
+        if not paragraph:
+            continue
+        if len(paragraph) > max_chars:
+            units.extend(_split_long(paragraph, max_chars))
+        else:
+            units.append(paragraph)
+
+    chunks, current = [], ""
+    for unit in units:
+        if current and len(current) + 2 + len(unit) > max_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap > 0 else ""
+            # Começa a sobreposição numa palavra inteira
+            if tail and " " in tail:
+                tail = tail[tail.index(" ") + 1:]
+            current = f"{tail}\n\n{unit}" if tail else unit
+        else:
+            current = f"{current}\n\n{unit}" if current else unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class LessonIngestor:
+    def __init__(
+        self,
+        embedder=None,
+        chunk_chars: int = INGEST_CHUNK_CHARS,
+        overlap: int = INGEST_CHUNK_OVERLAP,
+        batch_size: int = INGEST_EMBED_BATCH,
+        concurrency: int = INGEST_EMBED_CONCURRENCY,
+    ):
+        self.embedder = embedder or get_embedder(EMBEDDING_BACKEND)
+        self.chunk_chars = chunk_chars
+        self.overlap = overlap
+        self.batch_size = max(1, batch_size)
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._stats = {
+            "lessons": 0,
+            "lessons_changed": 0,
+            "chunks": 0,
+            "chunks_kept": 0,
+            "chunks_inserted": 0,
+            "chunks_deleted": 0,
+            "chunks_reindexed": 0,
+            "vectors_reused": 0,
+            "embedded": 0,
+            "embed_requests": 0,
+        }
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    # ---------- embeddings ----------
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        async with self._semaphore:
+            vectors = await self.embedder.embed(texts)
+        self._stats["embed_requests"] += 1
+        self._stats["embedded"] += len(texts)
+        return vectors
+
+    async def _embed(self, texts: Dict[str, str]) -> Dict[str, List[float]]:
+        """hash -> texto  =>  hash -> vetor (lotes em paralelo, limitados pelo semáforo)."""
+        hashes = list(texts)
+        batches = [hashes[i:i + self.batch_size] for i in range(0, len(hashes), self.batch_size)]
+        results = await asyncio.gather(
+            *(self._embed_batch([texts[h] for h in batch]) for batch in batches)
+        )
+        vectors = {}
+        for batch, batch_vectors in zip(batches, results):
+            vectors.update(zip(batch, batch_vectors))
+        return vectors
+
+    # ---------- banco ----------
+
+    async def _existing_hashes(self, session, lesson_ids) -> Dict[str, Dict[str, int]]:
+        """lesson_id -> {content_hash: chunk_index} do que já está no banco."""
+        result = await session.execute(
+            select(LessonEmbedding.lesson_id, LessonEmbedding.content_hash, LessonEmbedding.chunk_index)
+            .where(LessonEmbedding.lesson_id.in_(lesson_ids))
+        )
+        existing = {}
+        for lesson_id, content_hash, chunk_index in result:
+            existing.setdefault(lesson_id, {})[content_hash] = chunk_index
+        return existing
+
+    async def _known_vectors(self, session, hashes) -> Dict[str, List[float]]:
+        """Vetores já gravados para esses hashes (em qualquer lição)."""
+        if not hashes:
+            return {}
+        result = await session.execute(
+            select(LessonEmbedding.content_hash, LessonEmbedding.embedding)
+            .where(LessonEmbedding.content_hash.in_(hashes))
+            .where(LessonEmbedding.embedding.is_not(None))
+            .distinct(LessonEmbedding.content_hash)
+        )
+        return {content_hash: embedding for content_hash, embedding in result}
+
+    async def _ingest_group(self, lessons: List[tuple]):
+        plans = {}
+        for lesson_id, content in lessons:
+            chunks = {}
+            for index, text in enumerate(chunk_text(content, self.chunk_chars, self.overlap)):
+                chunks.setdefault(chunk_hash(text), (index, text))
+            plans[lesson_id] = chunks
+            self._stats["chunks"] += len(chunks)
+
+        # 1) Leituras numa sessão curta
+        async with AsyncSessionLocal() as session:
+            existing = await self._existing_hashes(session, list(plans))
+
+            rows, stale, reindex = [], {}, []
+            for lesson_id, chunks in plans.items():
+                current = existing.get(lesson_id, {})
+                missing = [h for h in chunks if h not in current]
+                removed = set(current) - set(chunks)
+                moved = [
+                    {"l": lesson_id, "h": h, "i": chunks[h][0]}
+                    for h in chunks
+                    if h in current and current[h] != chunks[h][0]
+                ]
+                self._stats["chunks_kept"] += len(chunks) - len(missing)
+                if not missing and not removed and not moved:
+                    continue
+                self._stats["lessons_changed"] += 1
+                if removed:
+                    stale[lesson_id] = removed
+                reindex.extend(moved)
+                for h in missing:
+                    index, text = chunks[h]
+                    rows.append({
+                        "lesson_id": lesson_id,
+                        "chunk_index": index,
+                        "content": text,
+                        "content_hash": h,
+                    })
+
+            needed = {row["content_hash"]: row["content"] for row in rows}
+            vectors = await self._known_vectors(session, list(needed))
+
+        # 2) Embeddings sem conexão do banco presa
+        self._stats["vectors_reused"] += len(vectors)
+        to_embed = {h: text for h, text in needed.items() if h not in vectors}
+        if to_embed:
+            vectors.update(await self._embed(to_embed))
+
+        if not rows and not stale and not reindex:
+            return
+
+        # 3) Gravação numa transação curta
+        async with AsyncSessionLocal() as session:
+            for lesson_id, hashes in stale.items():
+                hashes = [h for h in hashes if h is not None]
+                result = await session.execute(
+                    delete(LessonEmbedding).where(
+                        LessonEmbedding.lesson_id == lesson_id,
+                        or_(
+                            LessonEmbedding.content_hash.in_(hashes),
+                            LessonEmbedding.content_hash.is_(None),
+                        ),
+                    )
+                )
+                self._stats["chunks_deleted"] += result.rowcount or 0
+
+            if reindex:
+                # Trechos mantidos que mudaram de posição na lição editada
+                table = LessonEmbedding.__table__
+                await session.execute(
+                    update(table)
+                    .where(table.c.lesson_id == bindparam("l"), table.c.content_hash == bindparam("h"))
+                    .values(chunk_index=bindparam("i")),
+                    reindex,
+                )
+                self._stats["chunks_reindexed"] += len(reindex)
+
+            if rows:
+                for row in rows:
+                    row["embedding"] = vectors[row["content_hash"]]
+                await session.execute(
+                    insert(LessonEmbedding).on_conflict_do_nothing(
+                        index_elements=["lesson_id", "content_hash"]
+                    ),
+                    rows,
+                )
+                self._stats["chunks_inserted"] += len(rows)
+
+            await session.commit()
+
+    async def run(self, lesson_ids: Optional[List[str]] = None,
+                  group_size: int = LESSONS_PER_GROUP) -> dict:
+        query = select(Lesson.id, Lesson.content).order_by(Lesson.id)
+        if lesson_ids:
+            query = query.where(Lesson.id.in_(lesson_ids))
+
+        group = []
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(query.execution_options(yield_per=group_size * 4))
+            async for lesson_id, content in result:
+                group.append((lesson_id, content))
+                self._stats["lessons"] += 1
+                if len(group) >= group_size:
+                    await self._ingest_group(group)
+                    group = []
+            if group:
+                await self._ingest_group(group)
+
+        log_info("📚 Ingestão de lições concluída", event="lesson_ingest", **self._stats)
+        return self.stats()
+
+
+async def ingest_lessons(lesson_ids: Optional[List[str]] = None, **kwargs) -> dict:
+    backend = kwargs.pop("backend", EMBEDDING_BACKEND)
+    stats = await LessonIngestor(embedder=get_embedder(backend), **kwargs).run(lesson_ids)
+    # Chamada dentro do servidor: o índice local já passa a ver os trechos novos
+    if lesson_index.ready:
+        await lesson_index.refresh_if_changed()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera embeddings das lições (incremental).")
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, help="openai | hash")
+    parser.add_argument("--lesson", action="append", dest="lessons", help="só esta lição (repetível)")
+    parser.add_argument("--chunk-chars", type=int, default=INGEST_CHUNK_CHARS)
+    parser.add_argument("--overlap", type=int, default=INGEST_CHUNK_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=INGEST_EMBED_BATCH)
+    parser.add_argument("--concurrency", type=int, default=INGEST_EMBED_CONCURRENCY)
+    args = parser.parse_args()
+
+    try:
+        stats = asyncio.run(ingest_lessons(
+            args.lessons,
+            backend=args.backend,
+            chunk_chars=args.chunk_chars,
+            overlap=args.overlap,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+        ))
+    except Exception as e:
+        log_error(f"Erro na ingestão de lições: {e}")
+        raise
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
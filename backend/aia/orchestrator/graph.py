@@ -1,11 +1,24 @@
 # aia/orchestrator/graph.py
 
-from typing import Optional
+import asyncio
+from typing import Optional, AsyncIterator
 
 from aia.orchestrator.state import SessionState
-from aia.agents.tutor import TutorAgent
+from aia.orchestrator.streaming import SentenceSplitter
+from aia.agents.tutor import TutorAgent, FALLBACK_REPLY
 from aia.agents.memory_agent import MemoryAgent
 from aia.agents.curriculum_agent import CurriculumAgent
+from config import STREAM_TTS_MAX_PARALLEL, TTS_WARM_PHRASES_FILE
+
+# Falas que o tutor repete o dia todo (aquecidas no cache de voz)
+DEFAULT_WARM_PHRASES = [
+    FALLBACK_REPLY,
+    "Olá! Eu sou o seu tutor. Sobre o que você quer aprender hoje?",
+    "Muito bem!",
+    "Isso mesmo!",
+    "Vamos tentar de novo?",
+    "Ficou alguma dúvida?",
+]
 
 
 class AIAResponse:
@@ -26,6 +39,8 @@ class AIAOrchestrator:
     Nesta versão:
     - Se vier áudio: transcreve → gera resposta → sintetiza voz.
     - Se vier texto: usa diretamente → gera resposta → sintetiza voz.
+    - Modo stream (process_stream): tokens do LLM → frases → TTS por frase,
+      em paralelo com a geração do resto do texto.
     - Futuramente: integrar MemoryAgent, CurriculumAgent, LangGraph, etc.
     """
 
@@ -34,6 +49,11 @@ class AIAOrchestrator:
         self.memory = MemoryAgent()
         self.curriculum = CurriculumAgent()
 
+    async def _user_text(self, audio_bytes: Optional[bytes], text_input: Optional[str]) -> str:
+        if audio_bytes:
+            return await self.tutor.transcribe_audio(audio_bytes)
+        return text_input or ""
+
     async def process(
         self,
         audio_bytes: Optional[bytes],
@@ -41,12 +61,7 @@ class AIAOrchestrator:
         session: SessionState,
     ) -> AIAResponse:
         # 1) Determinar texto de entrada
-        transcript = ""
-        user_text = text_input or ""
-
-        if audio_bytes:
-            transcript = await self.tutor.transcribe_audio(audio_bytes)
-            user_text = transcript
+        user_text = await self._user_text(audio_bytes, text_input)
 
         # 2) Geração da resposta textual
         reply_text = await self.tutor.generate_reply(user_text, session)
@@ -54,27 +69,121 @@ class AIAOrchestrator:
         # 3) Síntese de voz
         audio_out = await self.tutor.synthesize_voice(reply_text)
 
-        # 4) (Opcional) atualizar memória / currículo futuramente
-        # self.memory.update(session, user_text, reply_text)
+        # 4) Atualiza o histórico; o resumo roda em background
+        self._remember_turn(session, user_text, reply_text)
         # self.curriculum.track_progress(session, user_text, reply_text)
 
         return AIAResponse(
-            transcript=transcript or user_text,
+            transcript=user_text,
             output_audio=audio_out,
             agent="tutor",
         )
 
+    def _remember_turn(self, session: SessionState, user_text: str, reply_text: str):
+        if session is None:
+            return
+        session.add_message("user", user_text)
+        session.add_message("assistant", reply_text)
+        self.memory.schedule_summary(session)
+
+    async def process_stream(
+        self,
+        audio_bytes: Optional[bytes],
+        text_input: Optional[str],
+        session: SessionState,
+    ) -> AsyncIterator[bytes]:
+        """
+        Versão em stream do process: devolve o áudio frase a frase.
+
+        Enquanto o LLM ainda gera o texto, cada frase completa já vai para o TTS
+        (até STREAM_TTS_MAX_PARALLEL sínteses à frente); os áudios saem na
+        ordem das frases. A primeira fala custa ~ STT + primeira frase + TTS dela.
+        """
+        user_text = await self._user_text(audio_bytes, text_input)
+
+        # Fila de tarefas de TTS, na ordem das frases (None = fim)
+        pending: asyncio.Queue = asyncio.Queue(maxsize=STREAM_TTS_MAX_PARALLEL)
+        # Quem limita as chamadas de TTS simultâneas é o semáforo: a fila ainda
+        # deixa uma tarefa com o consumidor e outra esperando no put
+        tts_slots = asyncio.Semaphore(STREAM_TTS_MAX_PARALLEL)
+
+        async def synthesize(sentence: str) -> bytes:
+            async with tts_slots:
+                return await self.tutor.synthesize_voice(sentence)
+
+        async def enqueue_tts(sentence: str):
+            tts_task = asyncio.create_task(synthesize(sentence))
+            try:
+                await pending.put(tts_task)
+            except asyncio.CancelledError:
+                tts_task.cancel()
+                raise
+
+        async def produce():
+            splitter = SentenceSplitter()
+            reply_parts = []
+            try:
+                async for delta in self.tutor.stream_reply(user_text, session):
+                    reply_parts.append(delta)
+                    for sentence in splitter.feed(delta):
+                        await enqueue_tts(sentence)
+                tail = splitter.flush()
+                if tail:
+                    await enqueue_tts(tail)
+                self._remember_turn(session, user_text, "".join(reply_parts).strip())
+            finally:
+                await pending.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                tts_task = await pending.get()
+                if tts_task is None:
+                    break
+                audio = await tts_task
+                if audio:
+                    yield audio
+            await producer
+        finally:
+            # Consumidor parou antes do fim (ex.: barge-in): cancela o resto
+            producer.cancel()
+            while not pending.empty():
+                tts_task = pending.get_nowait()
+                if tts_task is not None:
+                    tts_task.cancel()
+
 
 # Instância global do orquestrador
 _orchestrator = AIAOrchestrator()
 
 
-async def process_user_message(audio_bytes=None, text_input=None, state=None):
+async def process_user_message(audio_bytes=None, text_input=None, state=None, stream=False):
     """
     Função unificada chamada pelo main.py
+
+    Com stream=True devolve um iterador assíncrono de pedaços de áudio:
+        async for chunk in await process_user_message(..., stream=True): ...
     """
+    if stream:
+        return _orchestrator.process_stream(
+            audio_bytes=audio_bytes,
+            text_input=text_input,
+            session=state,
+        )
     return await _orchestrator.process(
         audio_bytes=audio_bytes,
         text_input=text_input,
         session=state,
     )
+
+
+async def warm_tts_cache(phrases=None):
+    """
+    Aquece o cache de voz com as frases padrão + as de TTS_WARM_PHRASES_FILE.
+    """
+    if phrases is None:
+        phrases = list(DEFAULT_WARM_PHRASES)
+        if TTS_WARM_PHRASES_FILE:
+            with open(TTS_WARM_PHRASES_FILE, encoding="utf-8") as f:
+                phrases.extend(line.strip() for line in f if line.strip())
+    await _orchestrator.tutor.warm_voice_cache(phrases)
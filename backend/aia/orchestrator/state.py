@@ -1,10 +1,14 @@
 # aia/orchestrator/state.py
 
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Deque
 
+from aia.tokens import estimate_tokens
+from config import SESSION_HISTORY_TOKENS
 
-@dataclass
+
+@dataclass(slots=True)
 class SessionState:
     """
     Estado cognitivo da sessão atual do aluno no AIA.
@@ -21,21 +25,35 @@ class SessionState:
     # Lição, tópico ou módulo atual do currículo
     current_lesson: Optional[str] = None
 
-    # Últimas mensagens trocadas (curto prazo)
-    recent_messages: List[Dict[str, str]] = field(default_factory=list)
+    # Últimas mensagens trocadas (curto prazo), limitadas por tokens
+    recent_messages: Deque[Dict[str, str]] = field(default_factory=deque)
+    recent_tokens: int = 0
+    max_history_tokens: int = SESSION_HISTORY_TOKENS
+
+    # Mensagens que saíram do histórico curto e ainda não entraram no resumo
+    evicted_messages: List[Dict[str, str]] = field(default_factory=list)
 
-    # Resumo consolidado da conversa (para memória longa futura)
+    # Resumo consolidado da conversa (mantido pelo MemoryAgent)
     conversation_summary: Optional[str] = None
 
     # Campo flexível para agentes armazenarem contexto
     extra: Dict[str, Any] = field(default_factory=dict)
 
-    def add_message(self, role: str, content: str):
+    def add_message(self, role: str, content: str) -> List[Dict[str, str]]:
         """
         Armazena uma mensagem no histórico curto da sessão.
+        Retorna as mensagens mais antigas que saíram para caber no limite de tokens
+        (elas também ficam em `evicted_messages` para o MemoryAgent resumir).
         """
         self.recent_messages.append({"role": role, "content": content})
+        self.recent_tokens += estimate_tokens(content)
+
+        # Mantém histórico curto controlado (sempre guarda a última mensagem)
+        evicted = []
+        while self.recent_tokens > self.max_history_tokens and len(self.recent_messages) > 1:
+            old = self.recent_messages.popleft()
+            self.recent_tokens -= estimate_tokens(old["content"])
+            evicted.append(old)
 
-        # Mantém histórico curto controlado
-        if len(self.recent_messages) > 20:
-            self.recent_messages.pop(0)
+        self.evicted_messages.extend(evicted)
+        return evicted
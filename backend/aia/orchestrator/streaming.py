@@ -0,0 +1,39 @@
+# aia/orchestrator/streaming.py
+
+import re
+from typing import List
+
+from config import STREAM_MIN_SENTENCE_CHARS
+
+# Fim de frase: pontuação seguida de espaço/quebra, ou quebra de linha
+_SENTENCE_END = re.compile(r"(?<=[.!?…:;])\s+|\n+")
+
+
+class SentenceSplitter:
+    """
+    Recebe os tokens do LLM aos pedaços e devolve frases completas assim que
+    elas terminam, para o TTS começar antes do fim da resposta.
+
+    Frases muito curtas ("Olá!") são juntadas com a seguinte, para não gerar
+    chamadas de TTS minúsculas.
+    """
+
+    def __init__(self, min_chars: int = STREAM_MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> str:
+        tail, self._buffer = self._buffer.strip(), ""
+        return tail
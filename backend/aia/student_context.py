@@ -0,0 +1,121 @@
+# aia/student_context.py
+
+import asyncio
+import json
+import time
+from typing import Optional
+
+from logger import log_info, log_warn
+from aia.tokens import estimate_tokens, truncate_to_tokens
+from aia.tools import get_current_lesson
+from aia.agents.memory_agent import load_long_memory, rank_memories
+from config import (
+    STUDENT_CONTEXT_TIMEOUT_S,
+    STUDENT_CONTEXT_TOKENS,
+    STUDENT_CONTEXT_MEMORIES,
+)
+
+
+async def load_student_context(student_id: str) -> dict:
+    """
+    Lição atual e perfil/memórias do aluno, buscados em paralelo (ambos com
+    cache por aluno: numa reconexão, normalmente nenhum vai ao banco).
+    As memórias são ordenadas pela relevância para a lição atual.
+    """
+    lesson, long_memory = await asyncio.gather(
+        get_current_lesson(student_id),
+        load_long_memory(student_id),
+    )
+    memories = rank_memories(
+        long_memory["memories"], _lesson_text(lesson) or "", STUDENT_CONTEXT_MEMORIES
+    )
+    return {"lesson": lesson, "profile": long_memory["profile"], "memories": memories}
+
+
+async def prefetch_student_context(student_id: str,
+                                   timeout: float = STUDENT_CONTEXT_TIMEOUT_S) -> Optional[dict]:
+    """
+    Busca o contexto do aluno com prazo. Roda enquanto a conexão upstream é
+    obtida; se o banco demorar ou falhar, a sessão começa sem contexto e o
+    modelo continua podendo usar as tools.
+    """
+    started = time.perf_counter()
+    try:
+        context = await asyncio.wait_for(load_student_context(student_id), timeout)
+    except asyncio.TimeoutError:
+        log_warn("⏱️ Contexto do aluno não chegou a tempo", event="student_context",
+                 timeout_s=timeout)
+        return None
+    except Exception as e:
+        log_warn(f"Erro ao buscar contexto do aluno: {e}", event="student_context")
+        return None
+
+    log_info("🧩 Contexto do aluno carregado", event="student_context",
+             context_ms=round((time.perf_counter() - started) * 1000, 1),
+             memories=len(context["memories"]))
+    return context
+
+
+def _lesson_text(lesson: dict) -> Optional[str]:
+    if "title" in lesson:
+        return f"{lesson['title']}\n{lesson.get('content', '')}"
+    if "topic" in lesson:
+        return f"{lesson['topic']}: {lesson.get('content', '')}"
+    return None
+
+
+def _profile_text(profile) -> Optional[str]:
+    if isinstance(profile, str):
+        try:
+            profile = json.loads(profile)
+        except ValueError:
+            return profile or None
+    if not profile:
+        return None
+    return "\n".join(f"- {key}: {value}" for key, value in profile.items())
+
+
+def realtime_instructions(student_name: str, context: Optional[dict] = None,
+                          budget: int = STUDENT_CONTEXT_TOKENS) -> str:
+    """
+    Instructions do session.update inicial. Com contexto, a lição, o perfil e
+    as memórias já vão embutidos (nessa ordem de prioridade dentro do orçamento
+    de tokens) e o modelo não precisa chamar get_current_lesson na 1ª pergunta.
+    """
+    lesson = _lesson_text(context["lesson"]) if context else None
+    base = (
+        f"Você é o Tutor AIA. O aluno é {student_name}. "
+        "Fale português do Brasil. Seja breve, simpático e didático. "
+        "Responda de forma direta. "
+        + (
+            "A lição atual está abaixo; use a tool 'get_current_lesson' só se ela mudar. "
+            if lesson else
+            "Use a tool 'get_current_lesson' se precisar saber o conteúdo. "
+        )
+        + "Use a tool 'search_lessons' para buscar material sobre uma dúvida específica."
+    )
+    if not context:
+        return base
+
+    # (rótulo, texto, fração máxima do orçamento): a lição é a mais importante,
+    # mas não pode ocupar tudo e esconder o perfil e as memórias
+    sections = []
+    if lesson:
+        sections.append(("LIÇÃO ATUAL:\n", lesson, 0.6))
+    profile = _profile_text(context.get("profile"))
+    if profile:
+        sections.append(("PERFIL DO ALUNO:\n", profile, 1.0))
+    if context.get("memories"):
+        sections.append(("O QUE JÁ SABEMOS DO ALUNO:\n",
+                         "\n".join(f"- {m}" for m in context["memories"]), 1.0))
+
+    remaining = budget
+    parts = [base]
+    for label, text, share in sections:
+        available = min(remaining, int(budget * share)) - estimate_tokens(label)
+        if available <= 0:
+            break
+        text = truncate_to_tokens(text, available)
+        parts.append(label + text)
+        remaining -= estimate_tokens(label) + estimate_tokens(text)
+    return "\n\n".join(parts)
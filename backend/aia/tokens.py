@@ -0,0 +1,22 @@
+# aia/tokens.py
+
+# Média aproximada para português com os tokenizers da OpenAI.
+# Evita depender do tiktoken só para contar tokens de prompt.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return -(-len(text) // CHARS_PER_TOKEN)  # arredonda para cima
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta o texto para caber em ~max_tokens (no último espaço possível)."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(max_chars - 1, 0)]
+    if " " in cut:
+        cut = cut[:cut.rfind(" ")]
+    return cut.rstrip() + "…"
@@ -1,9 +1,25 @@
 # Arquivo: aia/tools.py
+import asyncio
 import json
-from sqlalchemy import select
-from db import AsyncSessionLocal
-from models import Student, Lesson
-from logger import log_info
+from sqlalchemy import select, update, func, cast, case
+from sqlalchemy.dialects.postgresql import UUID
+from db import AsyncSessionLocal, listen_forever
+from models import Student, Lesson, LessonEmbedding
+from logger import log_info, log_warn
+from cache import TTLCache
+from aia.embeddings import embed_query
+from aia.vector_index import lesson_index
+from config import (
+    LESSON_CACHE_SIZE,
+    LESSON_CACHE_TTL_S,
+    SEARCH_LOCAL_INDEX,
+    SEARCH_PG_TIMEOUT_S,
+    SEARCH_DEFAULT_K,
+    SEARCH_SNIPPET_CHARS,
+)
+
+# Trunca o conteúdo para não gastar muitos tokens
+LESSON_CONTENT_MAX_CHARS = 1500
 
 # Definição para a OpenAI (Schema)
 TOOLS_SCHEMA = [
@@ -16,45 +32,213 @@ TOOLS_SCHEMA = [
             "properties": {},
             "required": []
         }
+    },
+    {
+        "type": "function",
+        "name": "search_lessons",
+        "description": "Busca trechos das lições mais relevantes para uma dúvida ou tema.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Dúvida ou tema a buscar, em poucas palavras."
+                },
+                "k": {
+                    "type": "integer",
+                    "description": "Quantidade de trechos (1 a 5)."
+                }
+            },
+            "required": ["query"]
+        }
     }
 ]
 
+# current_lesson é TEXT; só vira UUID (e entra no join) se tiver o formato de um
+_UUID_PATTERN = "^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+
+# Cache do payload pronto da lição atual.
+# Chave: (student_id, current_lesson) -> payload JSON já serializado
+_lesson_cache = TTLCache(maxsize=LESSON_CACHE_SIZE, ttl=LESSON_CACHE_TTL_S)
+# Lição atual conhecida de cada aluno: student_id -> current_lesson ("" = nenhuma).
+# Só é servido o payload da lição que o aluno tem agora.
+_current_lesson = TTLCache(maxsize=LESSON_CACHE_SIZE, ttl=LESSON_CACHE_TTL_S)
+# Sobe a cada invalidação: uma consulta que começou antes não repovoa o cache
+_generation = 0
+
+# Canal do NOTIFY disparado pelo trigger em students/lessons (aia_database_schema.sql)
+LESSON_CACHE_CHANNEL = "aia_lesson_cache"
+
+
 # Lógica de Execução
 async def execute_tool(name: str, args: dict, student_id: str):
     """Executa a ferramenta solicitada pela IA"""
     if name == "get_current_lesson":
         return await _get_current_lesson(student_id)
+    if name == "search_lessons":
+        return await _search_lessons(args.get("query", ""), args.get("k"))
     return {"error": "Ferramenta desconhecida"}
 
+
+def invalidate_lesson_cache(student_id: str = None, lesson_id: str = None):
+    """
+    Descarta o cache da lição atual de um aluno e/ou de todos os alunos
+    numa lição (ex.: conteúdo da lição editado).
+    """
+    global _generation
+    _generation += 1
+    if student_id:
+        _current_lesson.pop(student_id)
+        _lesson_cache.invalidate_where(lambda key, _: key[0] == student_id)
+    if lesson_id:
+        lesson_id = str(lesson_id)
+        _lesson_cache.invalidate_where(lambda key, _: key[1] == lesson_id)
+
+
+def _on_lesson_notify(payload: str):
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        log_warn(f"NOTIFY {LESSON_CACHE_CHANNEL} inválido: {payload!r}")
+        return
+    invalidate_lesson_cache(student_id=change.get("student_id"), lesson_id=change.get("lesson_id"))
+
+
+def _reset_lesson_cache():
+    global _generation
+    _generation += 1
+    _current_lesson.clear()
+    _lesson_cache.clear()
+
+
+async def watch_lesson_changes():
+    """
+    Invalida o cache quando students.current_lesson ou uma lição muda no banco,
+    venha a escrita de onde vier (painel, outro serviço, set_current_lesson).
+    Se o LISTEN cair, o cache é zerado ao reconectar; o TTL cobre o intervalo.
+    """
+    await listen_forever(LESSON_CACHE_CHANNEL, _on_lesson_notify, on_connect=_reset_lesson_cache)
+
+
+async def set_current_lesson(student_id: str, lesson_id: str):
+    """Troca a lição atual do aluno (e invalida o cache dele)."""
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(Student).where(Student.id == student_id).values(current_lesson=lesson_id)
+        )
+        await session.commit()
+    invalidate_lesson_cache(student_id=student_id)
+
+
+async def get_current_lesson(student_id: str) -> dict:
+    """Mesmo conteúdo da tool get_current_lesson, já como dict (usa o mesmo cache)."""
+    return json.loads(await _get_current_lesson(student_id))
+
+
 async def _get_current_lesson(student_id: str):
+    current = _current_lesson.get(student_id)
+    if current is not None:
+        cached = _lesson_cache.get((student_id, current))
+        if cached is not None:
+            return cached
+    generation = _generation
+
     async with AsyncSessionLocal() as session:
-        # Busca aluno
-        result = await session.execute(select(Student).where(Student.id == student_id))
-        student = result.scalar_one_or_none()
-        
-        if not student:
-            return json.dumps({"info": "Aluno não encontrado."})
-
-        # Se não tiver lição definida, retornamos uma genérica
-        if not student.current_lesson:
-            return json.dumps({
-                "topic": "Introdução",
-                "content": "O aluno ainda não escolheu um tópico. Pergunte o que ele quer aprender."
-            })
-
-        # Busca a lição
-        # OBS: Ajuste aqui se 'current_lesson' for ID (UUID) ou Título no seu banco
-        # Supondo que seja o ID:
+        # Aluno + lição numa consulta só. current_lesson é TEXT e lessons.id é UUID:
+        # o cast fica do lado do aluno (lessons.id continua usando lessons_pkey) e
+        # o CASE evita erro quando current_lesson não é um UUID válido.
+        current_lesson_uuid = case(
+            (
+                Student.current_lesson.regexp_match(_UUID_PATTERN),
+                cast(Student.current_lesson, UUID(as_uuid=True)),
+            ),
+            else_=None,
+        )
+        result = await session.execute(
+            select(
+                Student.current_lesson,
+                Lesson.title,
+                func.left(Lesson.content, LESSON_CONTENT_MAX_CHARS),
+            )
+            .outerjoin(Lesson, Lesson.id == current_lesson_uuid)
+            .where(Student.id == student_id)
+        )
+        row = result.one_or_none()
+
+    if row is None:
+        # Não cacheia: o aluno pode estar sendo criado pelo DB Worker agora
+        return json.dumps({"info": "Aluno não encontrado."})
+
+    current_lesson, title, content = row
+
+    # Se não tiver lição definida, retornamos uma genérica
+    if not current_lesson:
+        payload = json.dumps({
+            "topic": "Introdução",
+            "content": "O aluno ainda não escolheu um tópico. Pergunte o que ele quer aprender."
+        })
+    elif title is not None and content is not None:
+        payload = json.dumps({
+            "title": title,
+            "content": content + "..."
+        })
+    else:
+        # Lição inexistente ou sem conteúdo (NULL)
+        payload = json.dumps({"info": "Lição definida mas não encontrada."})
+
+    if generation == _generation:
+        current = current_lesson or ""
+        _current_lesson.set(student_id, current)
+        _lesson_cache.set((student_id, current), payload)
+    log_info(f"📚 Lição carregada do banco para {student_id}")
+    return payload
+
+
+async def _search_lessons_pg(vector, k: int):
+    async with AsyncSessionLocal() as session:
+        distance = LessonEmbedding.embedding.cosine_distance(vector).label("distance")
+        result = await session.execute(
+            select(LessonEmbedding.lesson_id, Lesson.title, LessonEmbedding.content, distance)
+            .join(Lesson, Lesson.id == LessonEmbedding.lesson_id)
+            .order_by(distance)
+            .limit(k)
+        )
+        return [(1.0 - d, (str(lesson_id), title, content or "")) for lesson_id, title, content, d in result]
+
+
+async def _search_lessons(query: str, k=None):
+    query = (query or "").strip()
+    if not query:
+        return json.dumps({"info": "Informe o que buscar."})
+    try:
+        k = max(1, min(int(k or SEARCH_DEFAULT_K), 5))
+    except (TypeError, ValueError):
+        k = SEARCH_DEFAULT_K
+
+    vector = await embed_query(query)
+
+    if SEARCH_LOCAL_INDEX == "local" and lesson_index.ready:
+        hits = lesson_index.search(vector, k)
+    else:
         try:
-            l_result = await session.execute(select(Lesson).where(Lesson.id == student.current_lesson))
-            lesson = l_result.scalar_one_or_none()
-            
-            if lesson:
-                return json.dumps({
-                    "title": lesson.title,
-                    "content": lesson.content[:1500] + "..." # Trunca para não gastar muitos tokens
-                })
-        except:
-            pass
-            
-        return json.dumps({"info": "Lição definida mas não encontrada."})
\ No newline at end of file
+            # Postgres (índice HNSW); com timeout curto para não travar o turno
+            hits = await asyncio.wait_for(_search_lessons_pg(vector, k), timeout=SEARCH_PG_TIMEOUT_S)
+        except Exception as e:
+            if SEARCH_LOCAL_INDEX != "fallback" or not lesson_index.ready:
+                raise
+            log_warn(f"Busca no Postgres falhou ({e!r}); usando índice local.")
+            hits = lesson_index.search(vector, k)
+
+    if not hits:
+        return json.dumps({"info": "Nenhum material encontrado para essa busca."})
+
+    return json.dumps({
+        "results": [
+            {
+                "title": title,
+                "content": content[:SEARCH_SNIPPET_CHARS],
+                "score": round(score, 3),
+            }
+            for score, (_, title, content) in hits
+        ]
+    })
@@ -0,0 +1,230 @@
+# aia/tts_cache.py
+
+import asyncio
+import hashlib
+import mmap
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Union
+
+from config import TTS_CACHE_DIR, TTS_CACHE_MEMORY_MB, TTS_CACHE_DISK_MB
+
+# Arquivos do disco mantidos mapeados ao mesmo tempo
+_MAPPED_FILES = 256
+
+Audio = Union[bytes, memoryview]
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Mesma fala com espaços/acentos codificados diferente -> mesma chave."""
+    return _SPACES.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model: str, voice: str, text: str) -> str:
+    raw = f"{model}\0{voice}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class TTSCache:
+    """
+    Cache de áudio sintetizado, endereçado por conteúdo (modelo + voz + texto).
+
+    - Memória: LRU limitado em bytes (acerto em microssegundos).
+    - Disco: um arquivo por chave, limitado em bytes; ao passar do limite
+      remove os arquivos usados há mais tempo (mtime). O acerto devolve um
+      memoryview sobre o arquivo mapeado (mmap), sem copiar: o mapeamento fica
+      aberto (LRU de _MAPPED_FILES) e é desfeito pelo coletor quando nenhum
+      memoryview entregue ainda o usa, mesmo que o arquivo já tenha sido
+      removido ou substituído.
+    As operações de disco rodam em thread (`lookup`/`store` são async); o
+    diretório só é criado e lido no primeiro uso, não na construção.
+    """
+
+    def __init__(
+        self,
+        directory: str = TTS_CACHE_DIR,
+        memory_bytes: int = int(TTS_CACHE_MEMORY_MB * 2**20),
+        disk_bytes: int = int(TTS_CACHE_DISK_MB * 2**20),
+    ):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_used = 0
+
+        self._disk_lock = threading.Lock()
+        self._disk = {}  # key -> (size, mtime)
+        self._disk_used = 0
+        self._maps = OrderedDict()  # key -> mmap (ACCESS_READ)
+        self._maps_lock = threading.Lock()  # event loop + threads de disco
+        self._ready = False
+        self._ready_lock = asyncio.Lock()
+
+        # Métricas
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ---------------- memória ----------------
+    def get_memory(self, key: str) -> Optional[bytes]:
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+        return data
+
+    def put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= len(old)
+        self._memory[key] = data
+        self._memory_used += len(data)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    # ---------------- disco ----------------
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _open_disk(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan_disk()
+
+    async def _ensure_disk(self):
+        if self._ready or not self.directory:
+            return
+        async with self._ready_lock:
+            if not self._ready:
+                await asyncio.to_thread(self._open_disk)
+                self._ready = True
+
+    def _scan_disk(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                st = os.stat(os.path.join(root, name))
+                self._disk[name] = (st.st_size, st.st_mtime)
+                self._disk_used += st.st_size
+
+    def get_mapped(self, key: str) -> Optional[memoryview]:
+        """Arquivo já mapeado: sem I/O, pode rodar no event loop."""
+        with self._maps_lock:
+            mm = self._maps.get(key)
+            if mm is None:
+                return None
+            self._maps.move_to_end(key)
+        with self._disk_lock:
+            entry = self._disk.get(key)
+            if entry:
+                self._disk[key] = (entry[0], time.time())  # LRU do disco
+        return memoryview(mm)
+
+    def get_disk(self, key: str) -> Optional[memoryview]:
+        if not self.directory or key not in self._disk:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)  # marca como usado (LRU por mtime, vale entre reinícios)
+            mtime = os.path.getmtime(path)
+        except (OSError, ValueError):
+            with self._disk_lock:
+                self._forget(key)
+            return None
+
+        with self._disk_lock:
+            if key in self._disk:
+                self._disk[key] = (len(mm), mtime)
+        return memoryview(mm)
+
+    def _keep_mapped(self, key: str, view: memoryview):
+        with self._maps_lock:
+            self._maps[key] = view.obj
+            self._maps.move_to_end(key)
+            while len(self._maps) > _MAPPED_FILES:
+                # Só solta a referência: o mmap fecha quando o último memoryview morrer
+                self._maps.popitem(last=False)
+
+    def put_disk(self, key: str, data: bytes):
+        if not self.directory or len(data) > self.disk_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # escrita atômica
+
+        with self._disk_lock:
+            self._forget(key)
+            self._disk[key] = (len(data), os.path.getmtime(path))
+            self._disk_used += len(data)
+            self._evict_disk()
+
+    def _forget(self, key: str):
+        with self._maps_lock:
+            self._maps.pop(key, None)  # o conteúdo mapeado antigo não é mais servido
+        entry = self._disk.pop(key, None)
+        if entry:
+            self._disk_used -= entry[0]
+
+    def _evict_disk(self):
+        if self._disk_used <= self.disk_bytes:
+            return
+        for key, _ in sorted(self._disk.items(), key=lambda item: item[1][1]):
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self._forget(key)
+            if self._disk_used <= self.disk_bytes:
+                break
+
+    # ---------------- API async ----------------
+    async def lookup(self, key: str) -> Optional[Audio]:
+        data = self.get_memory(key)
+        if data is not None:
+            self.memory_hits += 1
+            return data
+
+        view = self.get_mapped(key)
+        if view is None:
+            await self._ensure_disk()
+            view = await asyncio.to_thread(self.get_disk, key)
+            if view is not None:
+                self._keep_mapped(key, view)
+        if view is not None:
+            # Não copia para o tier de memória: as páginas já estão no page cache
+            self.disk_hits += 1
+            return view
+
+        self.misses += 1
+        return None
+
+    async def store(self, key: str, data: bytes):
+        self.put_memory(key, data)
+        await self._ensure_disk()
+        await asyncio.to_thread(self.put_disk, key, data)
+
+    def stats(self) -> dict:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_used,
+            "mapped_files": len(self._maps),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
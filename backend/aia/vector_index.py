@@ -0,0 +1,137 @@
+# aia/vector_index.py
+
+import asyncio
+from typing import List, Tuple
+
+import numpy as np
+from sqlalchemy import select, func
+
+from db import AsyncSessionLocal
+from models import Lesson, LessonEmbedding
+from logger import log_info, log_error
+from config import LESSON_INDEX_REFRESH_S
+
+
+class LocalVectorIndex:
+    """
+    Índice vetorial em memória (força bruta com NumPy, similaridade de cosseno).
+
+    Carregado a partir de lesson_embeddings, atende a busca quando o Postgres
+    está longe ou sobrecarregado, e permite testar a busca sem banco (`build`).
+    Com vetores normalizados, a busca é um único produto matriz-vetor.
+    `refresh_if_changed` recarrega quando a tabela muda (ex.: nova ingestão).
+    """
+
+    def __init__(self):
+        self._matrix = None  # (n, dim) float32, linhas normalizadas
+        self._meta = []      # [(lesson_id, title, content)]
+        self._fingerprint = None  # (linhas, created_at mais recente) do último load
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._matrix is not None and len(self._meta) > 0
+
+    def __len__(self):
+        return len(self._meta)
+
+    def build(self, vectors, meta: List[Tuple]):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(meta):
+            raise ValueError("vectors e meta precisam ter o mesmo número de linhas")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._matrix = matrix / norms
+        self._meta = list(meta)
+
+    def search(self, vector, k: int) -> List[Tuple[float, Tuple]]:
+        if not self.ready:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        scores = self._matrix @ (query / norm)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self._meta[i]) for i in top]
+
+    async def _db_fingerprint(self):
+        """
+        Quantidade de vetores + created_at mais recente. A ingestão apaga os
+        trechos velhos e insere os novos, então qualquer mudança altera um dos dois.
+        """
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(func.count(), func.max(LessonEmbedding.created_at))
+                .where(LessonEmbedding.embedding.is_not(None))
+            )
+            return tuple(result.one())
+
+    async def load_from_db(self):
+        """Lê todos os embeddings em blocos e reconstrói o índice."""
+        async with self._load_lock:
+            await self._load_from_db()
+
+    async def _load_from_db(self):
+        try:
+            # Antes da leitura: o que entrar durante o load aparece no próximo refresh
+            fingerprint = await self._db_fingerprint()
+            vectors, meta = [], []
+            async with AsyncSessionLocal() as session:
+                result = await session.stream(
+                    select(
+                        LessonEmbedding.lesson_id,
+                        Lesson.title,
+                        LessonEmbedding.content,
+                        LessonEmbedding.embedding,
+                    )
+                    .join(Lesson, Lesson.id == LessonEmbedding.lesson_id)
+                    .where(LessonEmbedding.embedding.is_not(None))
+                    .execution_options(yield_per=1000)
+                )
+                async for lesson_id, title, content, embedding in result:
+                    vectors.append(embedding)
+                    meta.append((str(lesson_id), title, content or ""))
+
+            if vectors:
+                self.build(np.vstack(vectors), meta)
+            else:
+                self._matrix, self._meta = None, []
+            self._fingerprint = fingerprint
+            log_info(f"🧭 Índice local de lições carregado: {len(meta)} vetores")
+        except Exception as e:
+            log_error(f"Erro ao carregar índice local de lições: {e}")
+
+    async def refresh_if_changed(self) -> bool:
+        """Recarrega o índice se lesson_embeddings mudou desde o último load."""
+        async with self._load_lock:
+            try:
+                fingerprint = await self._db_fingerprint()
+            except Exception as e:
+                log_error(f"Erro ao verificar índice local de lições: {e}")
+                return False
+            if fingerprint == self._fingerprint:
+                return False
+            await self._load_from_db()
+            return True
+
+
+# Índice do processo (usado pela tool search_lessons)
+lesson_index = LocalVectorIndex()
+
+
+async def load_lesson_index():
+    await lesson_index.load_from_db()
+
+
+async def keep_lesson_index_fresh(interval_s: float = LESSON_INDEX_REFRESH_S):
+    """Carrega o índice e, a cada interval_s, recarrega se a tabela mudou."""
+    await lesson_index.load_from_db()
+    if interval_s <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval_s)
+        await lesson_index.refresh_if_changed()
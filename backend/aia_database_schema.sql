@@ -26,14 +26,53 @@ CREATE TABLE IF NOT EXISTS lessons (
 CREATE TABLE IF NOT EXISTS lesson_embeddings (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     lesson_id UUID REFERENCES lessons(id) ON DELETE CASCADE,
+    content TEXT,                -- trecho da lição que gerou o embedding
+    chunk_index INTEGER,         -- posição do trecho na lição
+    content_hash TEXT,           -- sha256 do trecho (dedupe / ingestão incremental)
     embedding vector(1536),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Bancos criados antes destas colunas
+ALTER TABLE lesson_embeddings ADD COLUMN IF NOT EXISTS content TEXT;
+ALTER TABLE lesson_embeddings ADD COLUMN IF NOT EXISTS chunk_index INTEGER;
+ALTER TABLE lesson_embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Ingestão incremental: um trecho (hash) por lição
+CREATE UNIQUE INDEX IF NOT EXISTS idx_lesson_embeddings_lesson_hash
+ON lesson_embeddings (lesson_id, content_hash);
+
+CREATE INDEX IF NOT EXISTS idx_lesson_embeddings_hash
+ON lesson_embeddings (content_hash);
+
 -- Vector index
 CREATE INDEX IF NOT EXISTS idx_lesson_embeddings_vector
 ON lesson_embeddings USING hnsw (embedding vector_cosine_ops);
 
+-- Cache da lição atual no backend (aia/tools.py): avisa quando a lição de um
+-- aluno ou o conteúdo de uma lição muda, para invalidar na hora.
+CREATE OR REPLACE FUNCTION notify_lesson_cache() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'students' THEN
+        PERFORM pg_notify('aia_lesson_cache', json_build_object('student_id', NEW.id)::text);
+    ELSE
+        PERFORM pg_notify('aia_lesson_cache', json_build_object('lesson_id', OLD.id)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_students_current_lesson ON students;
+CREATE TRIGGER trg_students_current_lesson
+AFTER UPDATE OF current_lesson ON students
+FOR EACH ROW WHEN (OLD.current_lesson IS DISTINCT FROM NEW.current_lesson)
+EXECUTE FUNCTION notify_lesson_cache();
+
+DROP TRIGGER IF EXISTS trg_lessons_content ON lessons;
+CREATE TRIGGER trg_lessons_content
+AFTER UPDATE OF title, content OR DELETE ON lessons
+FOR EACH ROW EXECUTE FUNCTION notify_lesson_cache();
+
 -- Progress table
 CREATE TABLE IF NOT EXISTS progress (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -52,6 +91,10 @@ CREATE TABLE IF NOT EXISTS long_memory (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Memórias mais recentes do aluno (contexto inicial da sessão)
+CREATE INDEX IF NOT EXISTS idx_long_memory_student_created
+ON long_memory (student_id, created_at DESC);
+
 -- Conversation history
 CREATE TABLE IF NOT EXISTS conversation_history (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -60,3 +103,19 @@ CREATE TABLE IF NOT EXISTS conversation_history (
     content TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
+
+-- Fila durável de jobs (ex.: sincronização de alunos no login).
+-- available_at em epoch (segundos): claim empurra para agora + visibility timeout.
+CREATE TABLE IF NOT EXISTS job_queue (
+    id BIGSERIAL PRIMARY KEY,
+    queue TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ready',   -- ready | dead
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at DOUBLE PRECISION NOT NULL,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_queue_ready
+ON job_queue (queue, status, available_at);
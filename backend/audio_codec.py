@@ -0,0 +1,157 @@
+# audio_codec.py
+"""
+Codec da perna navegador <-> backend. A OpenAI sempre recebe e devolve PCM16
+mono a 24 kHz; entre o backend e o navegador o áudio pode ir mais compacto:
+
+    pcm16      PCM16 24 kHz          48 KB/s (padrão, como antes)
+    pcm16_16k  PCM16 16 kHz          32 KB/s
+    ulaw       G.711 μ-law 24 kHz    24 KB/s
+    ulaw_16k   G.711 μ-law 16 kHz    16 KB/s
+
+Escolhido por conexão com /ws?codec=<nome>. Toda a transcodificação é
+vetorizada em NumPy: μ-law por tabela (65536 entradas na codificação, 256 na
+decodificação) e reamostragem com estado entre blocos (sem estalos nas emendas).
+"""
+import numpy as np
+
+from config import REALTIME_SAMPLE_RATE
+
+# ==========================================
+# G.711 μ-law
+# ==========================================
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 8159
+_ULAW_SEGMENT_END = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+
+
+def _build_ulaw_tables():
+    # Decodificação: byte -> int16
+    u = ~np.arange(256, dtype=np.uint8)
+    sign = u & 0x80
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    magnitude = ((mantissa.astype(np.int32) << 3) + _ULAW_BIAS) << exponent.astype(np.int32)
+    decode = np.where(sign != 0, _ULAW_BIAS - magnitude, magnitude - _ULAW_BIAS).astype(np.int16)
+
+    # Codificação: int16 (lido como uint16) -> byte, em 14 bits como o G.711 de referência
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), _ULAW_CLIP) + (_ULAW_BIAS >> 2)
+    segment = np.searchsorted(_ULAW_SEGMENT_END, magnitude)
+    mantissa = (magnitude >> (segment + 1)) & 0x0F
+    code = np.where(segment >= 8, 0x7F, (segment << 4) | mantissa)  # fora da escala: máximo
+    encode = (code ^ mask).astype(np.uint8)
+    return encode, decode
+
+
+_ULAW_ENCODE, _ULAW_DECODE = _build_ulaw_tables()
+
+
+def ulaw_encode(pcm: np.ndarray) -> np.ndarray:
+    return _ULAW_ENCODE[pcm.astype(np.int16).view(np.uint16)]
+
+
+def ulaw_decode(data: np.ndarray) -> np.ndarray:
+    return _ULAW_DECODE[data]
+
+
+# ==========================================
+# REAMOSTRAGEM
+# ==========================================
+class Resampler:
+    """
+    Reamostragem por interpolação linear com estado entre blocos.
+    Na redução de taxa, um FIR passa-baixa (sinc janelado) corta o que ficaria
+    acima da nova frequência de Nyquist antes da interpolação.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int, taps: int = 31):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.step = src_rate / dst_rate
+        self._last = 0.0   # última amostra do bloco anterior
+        self._pos = 1.0    # posição da próxima saída (índice 0 = self._last)
+
+        self._fir = None
+        if dst_rate < src_rate:
+            cutoff = 0.45 * dst_rate / src_rate  # fração da taxa de entrada
+            n = np.arange(taps) - (taps - 1) / 2
+            fir = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+            self._fir = (fir / fir.sum()).astype(np.float32)
+            self._history = np.zeros(taps - 1, dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.src_rate == self.dst_rate or len(samples) == 0:
+            return samples
+        x = samples.astype(np.float32)
+
+        if self._fir is not None:
+            padded = np.concatenate((self._history, x))
+            self._history = padded[-(len(self._fir) - 1):]
+            x = np.convolve(padded, self._fir, mode="valid")
+
+        x = np.concatenate(([self._last], x))
+        end = len(x) - 1
+        count = int(np.floor((end - self._pos) / self.step)) + 1 if self._pos <= end else 0
+        positions = self._pos + self.step * np.arange(count)
+        out = np.interp(positions, np.arange(len(x)), x)
+
+        self._pos = (self._pos + self.step * count) - end
+        self._last = x[-1]
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+
+# ==========================================
+# CODEC DA CONEXÃO
+# ==========================================
+CODECS = {
+    # nome: (taxa no navegador, μ-law?)
+    "pcm16": (REALTIME_SAMPLE_RATE, False),
+    "pcm16_16k": (16000, False),
+    "ulaw": (REALTIME_SAMPLE_RATE, True),
+    "ulaw_16k": (16000, True),
+}
+DEFAULT_CODEC = "pcm16"
+
+
+class ClientCodec:
+    """Transcodificação de uma conexão: estados separados para subida e descida."""
+
+    def __init__(self, name: str = DEFAULT_CODEC, upstream_rate: int = REALTIME_SAMPLE_RATE):
+        if name not in CODECS:
+            raise ValueError(f"Codec desconhecido: {name}")
+        self.name = name
+        self.sample_rate, self.ulaw = CODECS[name]
+        self.passthrough = self.sample_rate == upstream_rate and not self.ulaw
+        self._up = Resampler(self.sample_rate, upstream_rate)
+        self._down = Resampler(upstream_rate, self.sample_rate)
+        self._odd = b""  # byte solto de PCM16 entre mensagens
+
+    @classmethod
+    def from_query(cls, name: str = None) -> "ClientCodec":
+        return cls((name or DEFAULT_CODEC).lower())
+
+    def describe(self) -> dict:
+        return {"type": "codec", "codec": self.name, "sample_rate": self.sample_rate}
+
+    def decode_uplink(self, data: bytes) -> bytes:
+        """Navegador -> PCM16 24 kHz para a OpenAI."""
+        if self.passthrough:
+            return data
+        if self.ulaw:
+            pcm = ulaw_decode(np.frombuffer(data, dtype=np.uint8))
+        else:
+            data = self._odd + data
+            cut = len(data) - len(data) % 2
+            self._odd = data[cut:]
+            pcm = np.frombuffer(data[:cut], dtype="<i2")
+        return self._up.process(pcm).astype("<i2").tobytes()
+
+    def encode_downlink(self, data: bytes) -> bytes:
+        """PCM16 24 kHz da OpenAI -> formato do navegador."""
+        if self.passthrough:
+            return data
+        pcm = self._down.process(np.frombuffer(data, dtype="<i2"))
+        if self.ulaw:
+            return ulaw_encode(pcm).tobytes()
+        return pcm.astype("<i2").tobytes()
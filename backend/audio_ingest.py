@@ -0,0 +1,102 @@
+# audio_ingest.py
+import asyncio
+
+from config import REALTIME_SAMPLE_RATE, AUDIO_CHUNK_MS, AUDIO_INGEST_MAX_BUFFER_MS
+from logger import log_warn
+
+BYTES_PER_SAMPLE = 2  # PCM16 mono
+
+
+def ms_to_bytes(ms: float, sample_rate: int = REALTIME_SAMPLE_RATE) -> int:
+    """Converte uma duração em ms para bytes de PCM16 mono (alinhado à amostra)."""
+    return int(sample_rate * ms / 1000) * BYTES_PER_SAMPLE
+
+
+def bytes_to_ms(n_bytes: int, sample_rate: int = REALTIME_SAMPLE_RATE) -> float:
+    return (n_bytes / BYTES_PER_SAMPLE) * 1000 / sample_rate
+
+
+class AudioChunker:
+    """
+    Agrupa os frames PCM16 do microfone em blocos de duração fixa antes do envio
+    para a OpenAI (um único base64 + json.dumps por bloco).
+
+    - Envia assim que um bloco de `chunk_ms` fica completo.
+    - O timer (`run`) envia o resto parcial quando ele já espera há `chunk_ms`,
+      então nenhum áudio fica retido mais do que isso.
+    - O buffer é limitado a `max_buffer_ms`: se o envio atrasar, o áudio mais
+      antigo é descartado (e contabilizado em `dropped_bytes`).
+    """
+
+    def __init__(
+        self,
+        on_chunk,
+        chunk_ms: int = AUDIO_CHUNK_MS,
+        max_buffer_ms: int = AUDIO_INGEST_MAX_BUFFER_MS,
+        sample_rate: int = REALTIME_SAMPLE_RATE,
+    ):
+        self.on_chunk = on_chunk
+        self.chunk_ms = chunk_ms
+        self.chunk_bytes = ms_to_bytes(chunk_ms, sample_rate)
+        self.max_bytes = max(ms_to_bytes(max_buffer_ms, sample_rate), self.chunk_bytes)
+
+        self._buffer = bytearray()
+        self._pending_since = None  # instante em que o áudio mais antigo do buffer chegou
+        self._send_lock = asyncio.Lock()
+        self._loop = asyncio.get_running_loop()
+
+        # Métricas simples
+        self.frames_in = 0
+        self.chunks_out = 0
+        self.dropped_bytes = 0
+
+    @property
+    def buffered_bytes(self) -> int:
+        return len(self._buffer)
+
+    async def push(self, data: bytes):
+        """Recebe um frame do navegador (tamanho arbitrário)."""
+        if not data:
+            return
+
+        self.frames_in += 1
+        if not self._buffer:
+            self._pending_since = self._loop.time()
+        self._buffer.extend(data)
+
+        # Buffer limitado: descarta o áudio mais antigo
+        overflow = len(self._buffer) - self.max_bytes
+        if overflow > 0:
+            overflow += overflow % BYTES_PER_SAMPLE
+            del self._buffer[:overflow]
+            if self.dropped_bytes == 0:
+                log_warn("⚠️ Buffer de áudio de entrada cheio - descartando áudio antigo.")
+            self.dropped_bytes += overflow
+
+        while len(self._buffer) >= self.chunk_bytes:
+            await self._emit(self.chunk_bytes)
+
+    async def flush(self):
+        """Envia imediatamente o que estiver no buffer."""
+        if self._buffer:
+            await self._emit(len(self._buffer))
+
+    async def run(self):
+        """Timer de flush: garante latência máxima de `chunk_ms` por bloco."""
+        interval = self.chunk_ms / 1000
+        while True:
+            await asyncio.sleep(interval / 2)
+            if self._buffer and self._loop.time() - self._pending_since >= interval:
+                await self.flush()
+
+    async def _emit(self, n_bytes: int):
+        async with self._send_lock:
+            n_bytes = min(n_bytes, len(self._buffer))
+            n_bytes -= n_bytes % BYTES_PER_SAMPLE
+            if n_bytes <= 0:
+                return
+            chunk = bytes(self._buffer[:n_bytes])
+            del self._buffer[:n_bytes]
+            self._pending_since = self._loop.time() if self._buffer else None
+            self.chunks_out += 1
+            await self.on_chunk(chunk)
@@ -0,0 +1,204 @@
+# audio_pacer.py
+import asyncio
+from collections import OrderedDict, deque
+
+from audio_ingest import bytes_to_ms, ms_to_bytes
+from config import REALTIME_SAMPLE_RATE, OUTBOUND_FRAME_MS, OUTBOUND_LEAD_MS
+
+# Quantos itens (respostas) recentes guardam posição enviada/ouvida
+_TRACKED_ITEMS = 16
+
+
+class _ItemTimeline:
+    """Quanto de um item de áudio já foi enviado e quando cada trecho toca no cliente."""
+
+    __slots__ = ("sent_ms", "segments")
+
+    def __init__(self):
+        self.sent_ms = 0.0
+        self.segments = []  # [(início no relógio do loop, duração em ms)]
+
+    def heard_ms(self, now: float) -> float:
+        heard = 0.0
+        for start, duration_ms in self.segments:
+            if now <= start:
+                break
+            heard += min((now - start) * 1000, duration_ms)
+        return heard
+
+
+class OutboundAudioPacer:
+    """
+    Ritmo de saída do áudio do tutor (PCM16 24 kHz da OpenAI) para o navegador.
+
+    - Junta os response.audio.delta num bytearray reaproveitado e envia em
+      frames de `frame_ms` (menos mensagens, menos AudioBuffer no navegador).
+    - Não envia mais rápido que o tempo real: o cliente fica com no máximo
+      `lead_ms` de áudio na frente do que está tocando. No barge-in, só esse
+      pouco já enviado é jogado fora; o resto nem sai do servidor.
+    - Mantém, por item_id, quanto foi enviado e quanto o aluno já ouviu
+      (estimado pelo relógio de reprodução do cliente).
+    """
+
+    def __init__(
+        self,
+        send,
+        frame_ms: int = OUTBOUND_FRAME_MS,
+        lead_ms: int = OUTBOUND_LEAD_MS,
+        sample_rate: int = REALTIME_SAMPLE_RATE,
+    ):
+        self.send = send
+        self.frame_ms = frame_ms
+        self.lead_ms = lead_ms
+        self.sample_rate = sample_rate
+        self.frame_bytes = ms_to_bytes(frame_ms, sample_rate)
+
+        self._buffer = bytearray()
+        self._segments = deque()   # [item_id, bytes restantes no buffer] na ordem do buffer
+        self._ended = set()        # itens sem mais deltas (pode mandar frame parcial)
+        self._items = OrderedDict()  # item_id -> _ItemTimeline
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._play_until = 0.0     # quando o cliente termina de tocar o que já recebeu
+        self._last_add = 0.0
+
+        # Métricas simples
+        self.frames_out = 0
+        self.bytes_out = 0
+        self.dropped_bytes = 0
+
+    @property
+    def buffered_ms(self) -> float:
+        return bytes_to_ms(len(self._buffer), self.sample_rate)
+
+    @property
+    def lead_now_ms(self) -> float:
+        """Áudio já enviado que o cliente ainda não tocou."""
+        return max(self._play_until - self._loop.time(), 0) * 1000
+
+    def _timeline(self, item_id) -> _ItemTimeline:
+        timeline = self._items.get(item_id)
+        if timeline is None:
+            timeline = self._items[item_id] = _ItemTimeline()
+            while len(self._items) > _TRACKED_ITEMS:
+                self._items.popitem(last=False)
+        return timeline
+
+    def add(self, item_id, data: bytes):
+        """Recebe um delta já decodificado (PCM16)."""
+        if not data:
+            return
+        self._buffer.extend(data)
+        if self._segments and self._segments[-1][0] == item_id:
+            self._segments[-1][1] += len(data)
+        else:
+            self._segments.append([item_id, len(data)])
+        self._timeline(item_id)
+        self._last_add = self._loop.time()
+        self._wakeup.set()
+
+    def end_item(self, item_id):
+        """Fim do áudio do item (response.audio.done): o resto sai mesmo sem completar um frame."""
+        if any(segment[0] == item_id for segment in self._segments):
+            self._ended.add(item_id)
+            self._wakeup.set()
+
+    def sent_ms(self, item_id) -> float:
+        timeline = self._items.get(item_id)
+        return timeline.sent_ms if timeline else 0.0
+
+    def heard_ms(self, item_id) -> float:
+        timeline = self._items.get(item_id)
+        return timeline.heard_ms(self._loop.time()) if timeline else 0.0
+
+    def clear(self) -> int:
+        """
+        Barge-in: descarta o que não saiu e considera que o cliente parou de
+        tocar agora (ele limpa a fila dele ao receber "interrupt").
+        """
+        now = self._loop.time()
+        dropped = len(self._buffer)
+        self._buffer.clear()
+        self._segments.clear()
+        self._ended.clear()
+        self.dropped_bytes += dropped
+
+        for timeline in self._items.values():
+            kept = []
+            for start, duration_ms in timeline.segments:
+                if start >= now:
+                    break
+                kept.append((start, min(duration_ms, (now - start) * 1000)))
+            timeline.segments = kept
+        self._play_until = now
+        return dropped
+
+    def _next_frame(self, idle: bool, starved: bool):
+        """(item_id, n_bytes) do próximo frame a enviar, ou None se deve esperar."""
+        if not self._segments:
+            return None
+        item_id, remaining = self._segments[0]
+        if remaining >= self.frame_bytes:
+            return item_id, self.frame_bytes
+        # Frame parcial: fim do item, outro item já na fila, deltas pararam de
+        # chegar, ou o cliente não tem nada para tocar (início da resposta)
+        if item_id in self._ended or len(self._segments) > 1 or idle or starved:
+            return item_id, remaining
+        return None
+
+    async def run(self):
+        frame_s = self.frame_ms / 1000
+        while True:
+            now = self._loop.time()
+            frame = self._next_frame(
+                idle=now - self._last_add >= frame_s,
+                starved=self._play_until <= now,
+            )
+            if frame is None:
+                self._wakeup.clear()
+                timeout = frame_s if self._buffer else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Tempo real + lead: espera o cliente consumir até sobrar só lead_ms
+            wait = (self._play_until - now) - self.lead_ms / 1000
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue  # o buffer pode ter sido limpo (barge-in) durante a espera
+
+            item_id, n_bytes = frame
+            n_bytes -= n_bytes % 2
+            if n_bytes <= 0:
+                # Sobrou um byte solto (delta de tamanho ímpar): descarta
+                del self._buffer[:self._segments[0][1]]
+                self._segments.popleft()
+                continue
+            chunk = bytes(self._buffer[:n_bytes])
+            del self._buffer[:n_bytes]
+            self._segments[0][1] -= n_bytes
+            if self._segments[0][1] <= 0:
+                self._segments.popleft()
+                if item_id in self._ended and not any(s[0] == item_id for s in self._segments):
+                    self._ended.discard(item_id)
+
+            duration_ms = bytes_to_ms(n_bytes, self.sample_rate)
+            start = max(self._play_until, now)
+            self._play_until = start + duration_ms / 1000
+            timeline = self._timeline(item_id)
+            timeline.sent_ms += duration_ms
+            timeline.segments.append((start, duration_ms))
+
+            self.frames_out += 1
+            self.bytes_out += n_bytes
+            await self.send(chunk)
+
+    def stats(self) -> dict:
+        return {
+            "frames_out": self.frames_out,
+            "sent_ms": round(bytes_to_ms(self.bytes_out, self.sample_rate)),
+            "dropped_ms": round(bytes_to_ms(self.dropped_bytes, self.sample_rate)),
+            "buffered_ms": round(self.buffered_ms),
+        }
@@ -1,16 +1,27 @@
 # auth.py
-import json
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from google.oauth2 import id_token
 from google.auth.transport import requests
 from datetime import datetime, timedelta
 import jwt
 from jwt.exceptions import PyJWTError
+from requests import Session
+from requests.adapters import HTTPAdapter
 
+from cache import TTLCache
 from config import (
     GOOGLE_CLIENT_ID,
+    GOOGLE_VERIFY_WORKERS,
+    GOOGLE_CERTS_DEFAULT_TTL_S,
     AIA_JWT_SECRET,
     AIA_JWT_ALGORITHM,
     AIA_JWT_EXP_HOURS,
+    AIA_TOKEN_CACHE_SIZE,
+    AIA_TOKEN_CACHE_TTL_S,
 )
 
 
@@ -18,11 +29,61 @@ class AuthError(Exception):
     pass
 
 
+class CachedCertsRequest(requests.Request):
+    """
+    Transporte do google-auth com uma requests.Session reaproveitada
+    (conexões keep-alive) e cache das respostas GET (os certificados de
+    assinatura do Google) pelo max-age do Cache-Control.
+    Usado de várias threads ao mesmo tempo.
+    """
+
+    _max_age = re.compile(r"max-age=(\d+)")
+
+    def __init__(self, pool_size: int = GOOGLE_VERIFY_WORKERS):
+        session = Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        super().__init__(session=session)
+        self._lock = threading.Lock()
+        self._cache = {}  # url -> (expires_at, response)
+        self.fetches = 0
+
+    def _ttl(self, response) -> float:
+        match = self._max_age.search(response.headers.get("cache-control", ""))
+        return float(match.group(1)) if match else GOOGLE_CERTS_DEFAULT_TTL_S
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=120, **kwargs):
+        if method != "GET":
+            return super().__call__(url, method, body, headers, timeout, **kwargs)
+
+        with self._lock:
+            item = self._cache.get(url)
+            if item and item[0] > time.monotonic():
+                return item[1]
+
+        response = super().__call__(url, method, body, headers, timeout, **kwargs)
+        self.fetches += 1
+        if response.status == 200:
+            with self._lock:
+                self._cache[url] = (time.monotonic() + self._ttl(response), response)
+        return response
+
+
+_google_request = CachedCertsRequest()
+_verify_executor = ThreadPoolExecutor(
+    max_workers=GOOGLE_VERIFY_WORKERS, thread_name_prefix="google-verify"
+)
+
+# token -> payload decodificado / (sub, email, name) -> token emitido
+_decoded_tokens = TTLCache(maxsize=AIA_TOKEN_CACHE_SIZE, ttl=AIA_TOKEN_CACHE_TTL_S)
+_issued_tokens = TTLCache(maxsize=AIA_TOKEN_CACHE_SIZE, ttl=AIA_TOKEN_CACHE_TTL_S)
+
+
 def verify_google_credential(credential: str):
     try:
         payload = id_token.verify_oauth2_token(
             credential,
-            requests.Request(),
+            _google_request,
             GOOGLE_CLIENT_ID
         )
         return payload
@@ -30,7 +91,22 @@ def verify_google_credential(credential: str):
         raise AuthError(f"Erro ao validar token Google: {str(e)}")
 
 
+async def verify_google_credential_async(credential: str):
+    """
+    Mesma validação, num pool de threads: a busca dos certificados e a
+    verificação da assinatura não bloqueiam o event loop (nem o áudio das
+    sessões abertas).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_verify_executor, verify_google_credential, credential)
+
+
 def create_aia_token(google_payload: dict):
+    key = (google_payload["sub"], google_payload.get("email"), google_payload.get("name"))
+    token = _issued_tokens.get(key)
+    if token is not None:
+        return token
+
     expires = datetime.utcnow() + timedelta(hours=AIA_JWT_EXP_HOURS)
 
     payload = {
@@ -40,15 +116,35 @@ def create_aia_token(google_payload: dict):
         "exp": expires,
     }
 
-    return jwt.encode(payload, AIA_JWT_SECRET, algorithm=AIA_JWT_ALGORITHM)
+    token = jwt.encode(payload, AIA_JWT_SECRET, algorithm=AIA_JWT_ALGORITHM)
+    _issued_tokens.set(key, token)
+    return token
 
 
 def decode_aia_token(token: str):
+    cached = _decoded_tokens.get(token)
+    if cached is not None:
+        # Não confia no cache além da expiração do próprio token
+        if cached.get("exp", 0) > time.time():
+            return dict(cached)
+        _decoded_tokens.pop(token)
+
     try:
-        return jwt.decode(
+        payload = jwt.decode(
             token,
             AIA_JWT_SECRET,
             algorithms=[AIA_JWT_ALGORITHM]
         )
     except PyJWTError as e:
         raise AuthError(f"Token inválido: {str(e)}")
+
+    _decoded_tokens.set(token, payload)
+    return dict(payload)
+
+
+def auth_stats() -> dict:
+    return {
+        "google_certs_fetches": _google_request.fetches,
+        "decoded_tokens": _decoded_tokens.stats(),
+        "issued_tokens": _issued_tokens.stats(),
+    }
@@ -0,0 +1,181 @@
+# bench/fake_realtime.py
+"""
+Servidor WebSocket local que imita a Realtime API da OpenAI para testes de carga
+do relay /ws (sem custo e sem depender da rede).
+
+Roteiro de cada turno, contado pelo áudio recebido em input_audio_buffer.append:
+  1. após --silence-ms de áudio: input_audio_buffer.speech_started
+  2. após mais --utterance-ms:   input_audio_buffer.speech_stopped
+  3. após --think-ms:            response.created e a cada --tool-every turnos
+                                 uma response.function_call_arguments.done
+                                 (espera function_call_output + response.create)
+  4. --reply-ms de áudio em response.audio.delta de --delta-ms cada, enviados
+     --audio-speed vezes mais rápido que o tempo real (como a API faz),
+     seguidos de response.audio.done / response.done.
+
+Uso (na pasta backend):
+    python -m bench.fake_realtime --port 9000
+    OPENAI_REALTIME_URL=ws://localhost:9000 uvicorn main:app --port 8000
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import math
+import struct
+
+import websockets
+
+SAMPLE_RATE = 24000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+
+_ids = itertools.count(1)
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{next(_ids)}"
+
+
+def _tone_b64(ms: int, freq: float = 220.0) -> str:
+    """Bloco PCM16 com um tom simples (calculado uma vez só)."""
+    n = SAMPLE_RATE * ms // 1000
+    samples = (int(8000 * math.sin(2 * math.pi * freq * i / SAMPLE_RATE)) for i in range(n))
+    return base64.b64encode(struct.pack(f"<{n}h", *samples)).decode("ascii")
+
+
+class FakeSession:
+    def __init__(self, ws, args):
+        self.ws = ws
+        self.args = args
+        self.delta_b64 = _tone_b64(args.delta_ms)
+
+        self.turn = 0
+        self.audio_ms = 0.0          # áudio recebido no turno atual
+        self.state = "silence"       # silence -> speaking -> responding
+        self.response_task = None
+        self.tool_done = None
+
+    async def send(self, event: dict):
+        await self.ws.send(json.dumps(event))
+
+    async def handle(self):
+        await self.send({"type": "session.created", "session": {"id": _new_id("sess")}})
+        async for raw in self.ws:
+            event = json.loads(raw)
+            evt_type = event.get("type")
+
+            if evt_type == "session.update":
+                await self.send({"type": "session.updated", "session": event.get("session", {})})
+            elif evt_type == "input_audio_buffer.append":
+                await self.on_audio(len(event.get("audio", "")) * 3 // 4)
+            elif evt_type == "input_audio_buffer.clear":
+                await self.send({"type": "input_audio_buffer.cleared"})
+            elif evt_type == "conversation.item.create":
+                if event.get("item", {}).get("type") == "function_call_output" and self.tool_done:
+                    self.tool_done.set()
+            elif evt_type == "response.create":
+                pass  # o roteiro já continua sozinho após a tool
+            elif evt_type == "response.cancel":
+                self.cancel_response()
+            elif evt_type == "conversation.item.truncate":
+                await self.send({"type": "conversation.item.truncated", "item_id": event.get("item_id"),
+                                 "audio_end_ms": event.get("audio_end_ms")})
+
+        self.cancel_response()
+
+    async def on_audio(self, n_bytes: int):
+        self.audio_ms += n_bytes / BYTES_PER_MS
+
+        if self.state == "silence" and self.audio_ms >= self.args.silence_ms:
+            self.state = "speaking"
+            self.audio_ms = 0.0
+            self.cancel_response()
+            await self.send({"type": "input_audio_buffer.speech_started", "item_id": _new_id("item")})
+
+        elif self.state == "speaking" and self.audio_ms >= self.args.utterance_ms:
+            self.state = "responding"
+            self.audio_ms = 0.0
+            self.turn += 1
+            await self.send({"type": "input_audio_buffer.speech_stopped"})
+            self.response_task = asyncio.create_task(self.respond())
+
+    def cancel_response(self):
+        if self.response_task and not self.response_task.done():
+            self.response_task.cancel()
+
+    async def respond(self):
+        args = self.args
+        try:
+            await asyncio.sleep(args.think_ms / 1000)
+
+            if args.tool_every and self.turn % args.tool_every == 0:
+                response_id = _new_id("resp")
+                await self.send({"type": "response.created", "response": {"id": response_id}})
+                self.tool_done = asyncio.Event()
+                await self.send({
+                    "type": "response.function_call_arguments.done",
+                    "response_id": response_id,
+                    "call_id": _new_id("call"),
+                    "name": args.tool_name,
+                    "arguments": "{}",
+                })
+                await self.send({"type": "response.done", "response": {"id": response_id}})
+                await self.tool_done.wait()
+
+            response_id = _new_id("resp")
+            item_id = _new_id("item")
+            await self.send({"type": "response.created", "response": {"id": response_id}})
+
+            interval = args.delta_ms / 1000 / args.audio_speed
+            for _ in range(max(args.reply_ms // args.delta_ms, 1)):
+                await self.send({
+                    "type": "response.audio.delta",
+                    "response_id": response_id,
+                    "item_id": item_id,
+                    "content_index": 0,
+                    "delta": self.delta_b64,
+                })
+                await asyncio.sleep(interval)
+
+            await self.send({"type": "response.audio.done", "response_id": response_id, "item_id": item_id})
+            await self.send({
+                "type": "response.audio_transcript.done",
+                "response_id": response_id,
+                "item_id": item_id,
+                "transcript": "Resposta simulada do tutor.",
+            })
+            await self.send({"type": "response.done", "response": {"id": response_id}})
+        except (asyncio.CancelledError, websockets.ConnectionClosed):
+            pass
+        finally:
+            self.state = "silence"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Realtime API falsa para bench do /ws")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--silence-ms", type=int, default=1000)
+    parser.add_argument("--utterance-ms", type=int, default=1500)
+    parser.add_argument("--think-ms", type=int, default=300)
+    parser.add_argument("--reply-ms", type=int, default=3000)
+    parser.add_argument("--delta-ms", type=int, default=50)
+    parser.add_argument("--audio-speed", type=float, default=3.0)
+    parser.add_argument("--tool-every", type=int, default=0, help="0 = nunca chama tool")
+    parser.add_argument("--tool-name", default="get_current_lesson")
+    args = parser.parse_args()
+
+    async def handler(ws, *_):
+        await FakeSession(ws, args).handle()
+
+    async def serve():
+        async with websockets.serve(handler, args.host, args.port, max_size=None):
+            print(f"Realtime falsa em ws://{args.host}:{args.port}")
+            await asyncio.Future()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
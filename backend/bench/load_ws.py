@@ -0,0 +1,202 @@
+# bench/load_ws.py
+"""
+Simula N alunos falando com o /ws do main.py ao mesmo tempo e mede o relay.
+
+Cada aluno recebe um token válido de create_aia_token, envia áudio em tempo
+real no codec de --codec (PCM16 24 kHz por padrão; frames de --frame-ms, como
+o ScriptProcessor do navegador) e recebe o áudio do tutor. Ao final mostra:
+  - vazão do relay (bytes/s e frames/s em cada direção),
+  - latência "interrupt -> primeiro áudio" (p50/p90/p99) por turno,
+  - CPU e memória por sessão do processo do servidor (--server-pid, via /proc).
+
+Contra o servidor falso (bench/fake_realtime.py) a latência inclui o roteiro
+fixo (--utterance-ms + --think-ms do fake); passe --scripted-delay-ms para
+descontá-lo e ver só o custo do relay.
+
+Uso (na pasta backend):
+    python -m bench.load_ws --students 200 --duration 60 --server-pid <pid do uvicorn>
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import struct
+import time
+
+import websockets
+
+from auth import create_aia_token
+from audio_codec import ClientCodec, CODECS
+
+SAMPLE_RATE = 24000
+
+
+def _pcm_frame(ms: int) -> bytes:
+    n = SAMPLE_RATE * ms // 1000
+    return struct.pack(f"<{n}h", *(int(3000 * math.sin(2 * math.pi * 180 * i / SAMPLE_RATE)) for i in range(n)))
+
+
+def _client_frame(ms: int, codec: str) -> bytes:
+    """Frame de --frame-ms já no formato que o navegador enviaria nesse codec."""
+    return ClientCodec(codec).encode_downlink(_pcm_frame(ms))
+
+
+def _percentile(values: list, p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class ProcSampler:
+    """CPU (utime+stime) e RSS de um processo lidos de /proc (Linux)."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK")
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_bytes(self) -> int:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+
+class Stats:
+    def __init__(self):
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.frames_up = 0
+        self.frames_down = 0
+        self.latencies_ms = []
+        self.connected = 0
+        self.failed = 0
+
+
+async def student(index: int, args, frame: bytes, stats: Stats, stop_at: float):
+    token = create_aia_token({
+        "sub": f"bench-{index}",
+        "email": f"bench-{index}@example.com",
+        "name": f"Aluno {index}",
+    })
+    url = f"{args.url}?token={token}&codec={args.codec}"
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            stats.connected += 1
+            interrupt_at = None
+
+            async def sender():
+                interval = args.frame_ms / 1000
+                next_at = time.perf_counter()
+                while time.perf_counter() < stop_at:
+                    await ws.send(frame)
+                    stats.bytes_up += len(frame)
+                    stats.frames_up += 1
+                    next_at += interval
+                    await asyncio.sleep(max(next_at - time.perf_counter(), 0))
+
+            async def receiver():
+                nonlocal interrupt_at
+                async for msg in ws:
+                    if isinstance(msg, bytes):
+                        stats.bytes_down += len(msg)
+                        stats.frames_down += 1
+                        if interrupt_at is not None:
+                            elapsed = (time.perf_counter() - interrupt_at) * 1000
+                            stats.latencies_ms.append(elapsed - args.scripted_delay_ms)
+                            interrupt_at = None
+                    elif json.loads(msg).get("type") == "interrupt":
+                        interrupt_at = time.perf_counter()
+
+            recv_task = asyncio.create_task(receiver())
+            await sender()
+            recv_task.cancel()
+    except Exception as e:
+        stats.failed += 1
+        if stats.failed <= 5:
+            print(f"Aluno {index} falhou: {e}")
+
+
+async def run(args):
+    frame = _client_frame(args.frame_ms, args.codec)
+    stats = Stats()
+    sampler = ProcSampler(args.server_pid) if args.server_pid else None
+
+    rss_before = sampler.rss_bytes() if sampler else 0
+    cpu_before = sampler.cpu_seconds() if sampler else 0.0
+
+    started = time.perf_counter()
+    stop_at = started + args.ramp + args.duration
+    tasks = []
+    for i in range(args.students):
+        tasks.append(asyncio.create_task(student(i, args, frame, stats, stop_at)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.students)
+
+    # RSS de pico enquanto todos estão conectados
+    rss_peak = rss_before
+    while not all(t.done() for t in tasks):
+        if sampler:
+            rss_peak = max(rss_peak, sampler.rss_bytes())
+        await asyncio.sleep(1)
+
+    elapsed = time.perf_counter() - started
+    sessions = max(stats.connected, 1)
+    report = {
+        "students": args.students,
+        "codec": args.codec,
+        "connected": stats.connected,
+        "failed": stats.failed,
+        "elapsed_s": round(elapsed, 1),
+        "up_bytes_per_s": round(stats.bytes_up / elapsed),
+        "down_bytes_per_s": round(stats.bytes_down / elapsed),
+        "up_frames_per_s": round(stats.frames_up / elapsed, 1),
+        "down_frames_per_s": round(stats.frames_down / elapsed, 1),
+        "turns": len(stats.latencies_ms),
+        "latency_ms_p50": round(_percentile(stats.latencies_ms, 50), 1),
+        "latency_ms_p90": round(_percentile(stats.latencies_ms, 90), 1),
+        "latency_ms_p99": round(_percentile(stats.latencies_ms, 99), 1),
+    }
+    if sampler:
+        cpu = sampler.cpu_seconds() - cpu_before
+        report.update({
+            "server_cpu_pct_total": round(100 * cpu / elapsed, 1),
+            "server_cpu_ms_per_session_per_s": round(1000 * cpu / elapsed / sessions, 2),
+            "server_rss_mb_per_session": round((rss_peak - rss_before) / sessions / 2**20, 3),
+        })
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>34}: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do relay /ws")
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="segundos com todos conectados")
+    parser.add_argument("--ramp", type=float, default=5, help="segundos para conectar todos")
+    parser.add_argument("--frame-ms", type=int, default=170, help="4096 amostras a 24 kHz ~ 170 ms")
+    parser.add_argument("--codec", default="pcm16", choices=sorted(CODECS),
+                        help="codec da perna navegador <-> backend")
+    parser.add_argument("--scripted-delay-ms", type=float, default=0,
+                        help="atraso fixo do roteiro do servidor falso a descontar")
+    parser.add_argument("--server-pid", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,28 +4,180 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _parse_map(raw: str, cast=float) -> dict:
+    """Lê variáveis no formato "chave=valor,chave2=valor2"."""
+    result = {}
+    for item in raw.split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            result[key.strip()] = cast(value.strip())
+    return result
+
+
 # ========== OPENAI ==========
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 REALTIME_MODEL = os.getenv("REALTIME_MODEL", "gpt-4o-realtime-preview")
+# Troque por ws://localhost:9000 para usar o servidor falso de bench/fake_realtime.py
+OPENAI_REALTIME_URL = os.getenv("OPENAI_REALTIME_URL", "wss://api.openai.com/v1/realtime")
 
 OPENAI_MODEL_TEXT = os.getenv("OPENAI_MODEL_TEXT", "gpt-4.1-mini")   # ou gpt-4o-mini
 OPENAI_MODEL_STT  = os.getenv("OPENAI_MODEL_STT",  "whisper-1")
 OPENAI_MODEL_TTS  = os.getenv("OPENAI_MODEL_TTS",  "tts-1")
 OPENAI_TTS_VOICE  = os.getenv("OPENAI_TTS_VOICE",  "alloy")
+OPENAI_MODEL_EMBEDDING = os.getenv("OPENAI_MODEL_EMBEDDING", "text-embedding-3-small")  # 1536 dims
+# openai | hash (determinístico, local, para testes)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
 
 
 # ========== GOOGLE AUTH ==========
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
+# Threads para validar credenciais Google fora do event loop
+GOOGLE_VERIFY_WORKERS = int(os.getenv("GOOGLE_VERIFY_WORKERS", "4"))
+# Validade dos certificados do Google quando a resposta não traz max-age
+GOOGLE_CERTS_DEFAULT_TTL_S = float(os.getenv("GOOGLE_CERTS_DEFAULT_TTL_S", "300"))
 
 # ========== JWT INTERNO DO AIA ==========
 AIA_JWT_SECRET = os.getenv("AIA_JWT_SECRET", "change-me")
 AIA_JWT_ALGORITHM = os.getenv("AIA_JWT_ALGORITHM", "HS256")
 AIA_JWT_EXP_HOURS = int(os.getenv("AIA_JWT_EXP_HOURS", "8"))
+# Cache curto de tokens emitidos/decodificados (rajadas de login e reconexões)
+AIA_TOKEN_CACHE_SIZE = int(os.getenv("AIA_TOKEN_CACHE_SIZE", "10000"))
+AIA_TOKEN_CACHE_TTL_S = float(os.getenv("AIA_TOKEN_CACHE_TTL_S", "60"))
 
 # ========== POSTGRES ==========
 POSTGRES_URL = os.getenv("POSTGRES_URL", "")
 
+# Perfil do engine: "dev" (echo de SQL, pool padrão) ou "production"
+DB_PROFILE = os.getenv("DB_PROFILE", "dev")
+DB_ECHO = os.getenv("DB_ECHO", "")  # "true"/"false"; vazio = segue o perfil
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "10"))
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# 0 desliga prepared statements (necessário atrás de PgBouncer em modo transaction)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
 # ========== OUTROS (OPCIONAIS) ==========
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY", "")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "")
+
+# ========== REALTIME RELAY ==========
+REALTIME_SAMPLE_RATE = int(os.getenv("REALTIME_SAMPLE_RATE", "24000"))  # PCM16 mono
+AUDIO_CHUNK_MS = int(os.getenv("AUDIO_CHUNK_MS", "100"))                # 40 / 100 / 200...
+AUDIO_INGEST_MAX_BUFFER_MS = int(os.getenv("AUDIO_INGEST_MAX_BUFFER_MS", "1000"))
+
+# Saída de áudio para o navegador: frames de OUTBOUND_FRAME_MS, no máximo
+# OUTBOUND_LEAD_MS à frente do que o cliente está tocando
+OUTBOUND_FRAME_MS = int(os.getenv("OUTBOUND_FRAME_MS", "100"))
+OUTBOUND_LEAD_MS = int(os.getenv("OUTBOUND_LEAD_MS", "300"))
+
+# Gate de voz no servidor antes do envio upstream: off | energy | silero
+SERVER_VAD_GATE = os.getenv("SERVER_VAD_GATE", "off")
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "30"))          # silero usa 32 ms fixos
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "300"))     # >= prefix_padding_ms
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "800"))   # > silence_duration_ms
+VAD_ENERGY_DBFS = float(os.getenv("VAD_ENERGY_DBFS", "-45"))
+VAD_ZCR_MAX = float(os.getenv("VAD_ZCR_MAX", "0.35"))
+VAD_SILERO_THRESHOLD = float(os.getenv("VAD_SILERO_THRESHOLD", "0.5"))
+VAD_SILERO_MODEL = os.getenv(
+    "VAD_SILERO_MODEL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "silero_vad_legacy.onnx"),
+)
+VAD_SILERO_THREADS = int(os.getenv("VAD_SILERO_THREADS", "0"))         # 0 = metade dos núcleos
+VAD_SILERO_MAX_LAG_MS = int(os.getenv("VAD_SILERO_MAX_LAG_MS", "100"))  # fila maior -> detector de energia
+
+# Filas por direção do relay: drop_oldest | block | disconnect
+RELAY_UPSTREAM_QUEUE_SIZE = int(os.getenv("RELAY_UPSTREAM_QUEUE_SIZE", "50"))
+RELAY_UPSTREAM_POLICY = os.getenv("RELAY_UPSTREAM_POLICY", "drop_oldest")
+RELAY_DOWNSTREAM_QUEUE_SIZE = int(os.getenv("RELAY_DOWNSTREAM_QUEUE_SIZE", "500"))
+RELAY_DOWNSTREAM_POLICY = os.getenv("RELAY_DOWNSTREAM_POLICY", "drop_oldest")
+
+# Pool de conexões Realtime pré-aquecidas (0 = desligado)
+REALTIME_POOL_SIZE = int(os.getenv("REALTIME_POOL_SIZE", "4"))
+REALTIME_POOL_MAX_IDLE_S = float(os.getenv("REALTIME_POOL_MAX_IDLE_S", "240"))
+REALTIME_POOL_REFILL_INTERVAL_S = float(os.getenv("REALTIME_POOL_REFILL_INTERVAL_S", "5"))
+
+# Tools chamadas pela IA: timeout padrão e por tool ("get_current_lesson=3,...")
+TOOL_TIMEOUT_S = float(os.getenv("TOOL_TIMEOUT_S", "5"))
+TOOL_TIMEOUTS = _parse_map(os.getenv("TOOL_TIMEOUTS", ""))
+
+# ========== CACHES ==========
+LESSON_CACHE_SIZE = int(os.getenv("LESSON_CACHE_SIZE", "2048"))
+LESSON_CACHE_TTL_S = float(os.getenv("LESSON_CACHE_TTL_S", "300"))
+
+# ========== DB WORKER ==========
+STUDENT_SYNC_WORKERS = int(os.getenv("STUDENT_SYNC_WORKERS", "1"))
+STUDENT_SYNC_BATCH_SIZE = int(os.getenv("STUDENT_SYNC_BATCH_SIZE", "100"))
+STUDENT_SYNC_BATCH_WAIT_MS = int(os.getenv("STUDENT_SYNC_BATCH_WAIT_MS", "200"))
+# memory (um processo) | postgres (tabela job_queue) | sqlite (arquivo local)
+STUDENT_SYNC_QUEUE = os.getenv("STUDENT_SYNC_QUEUE", "memory")
+STUDENT_SYNC_SQLITE_PATH = os.getenv("STUDENT_SYNC_SQLITE_PATH", "student_sync_queue.db")
+STUDENT_SYNC_VISIBILITY_S = float(os.getenv("STUDENT_SYNC_VISIBILITY_S", "30"))
+STUDENT_SYNC_MAX_ATTEMPTS = int(os.getenv("STUDENT_SYNC_MAX_ATTEMPTS", "5"))
+STUDENT_SYNC_RETRY_BACKOFF_S = float(os.getenv("STUDENT_SYNC_RETRY_BACKOFF_S", "2"))
+STUDENT_SYNC_POLL_MS = int(os.getenv("STUDENT_SYNC_POLL_MS", "500"))
+
+# ========== LOGS ==========
+LOG_FILE = os.getenv("LOG_FILE", "aia_backend.log")      # vazio = sem arquivo
+LOG_STDOUT = os.getenv("LOG_STDOUT", "text")             # text | json | off
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Amostragem e limite por tipo de evento ("barge_in=0.2,tool_call=1")
+LOG_SAMPLE_RATES = _parse_map(os.getenv("LOG_SAMPLE_RATES", ""))
+LOG_RATE_LIMITS = _parse_map(os.getenv("LOG_RATE_LIMITS", ""))  # eventos/s
+
+# ========== PIPELINE STT -> LLM -> TTS (fallback sem Realtime) ==========
+STREAM_TTS_MAX_PARALLEL = int(os.getenv("STREAM_TTS_MAX_PARALLEL", "3"))
+STREAM_MIN_SENTENCE_CHARS = int(os.getenv("STREAM_MIN_SENTENCE_CHARS", "20"))
+
+# Cache de áudio do TTS (memória + disco)
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")                # vazio = só memória
+TTS_CACHE_MEMORY_MB = float(os.getenv("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", "512"))
+TTS_WARM_ON_STARTUP = os.getenv("TTS_WARM_ON_STARTUP", "false").lower() == "true"
+TTS_WARM_PHRASES_FILE = os.getenv("TTS_WARM_PHRASES_FILE", "")          # uma frase por linha
+
+# Prompt do tutor: orçamento de tokens e memoização
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1800"))
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "512"))
+
+# Gravação em lote do histórico de conversa (write-behind)
+HISTORY_FLUSH_ROWS = int(os.getenv("HISTORY_FLUSH_ROWS", "200"))
+HISTORY_FLUSH_INTERVAL_S = float(os.getenv("HISTORY_FLUSH_INTERVAL_S", "5"))
+HISTORY_MAX_BUFFER_ROWS = int(os.getenv("HISTORY_MAX_BUFFER_ROWS", "20000"))
+# Tentativas de uma linha rejeitada pelo banco (ex.: aluno ainda não sincronizado)
+HISTORY_ROW_MAX_ATTEMPTS = int(os.getenv("HISTORY_ROW_MAX_ATTEMPTS", "3"))
+
+# Histórico curto da sessão (em tokens) e resumo contínuo
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "1500"))
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "300"))
+
+# Busca semântica nas lições (tool search_lessons)
+# SEARCH_LOCAL_INDEX: off | fallback (usa o índice local se o Postgres falhar/demorar) | local
+SEARCH_LOCAL_INDEX = os.getenv("SEARCH_LOCAL_INDEX", "off")
+SEARCH_PG_TIMEOUT_S = float(os.getenv("SEARCH_PG_TIMEOUT_S", "1.5"))
+# De quanto em quanto tempo o índice local confere se lesson_embeddings mudou (0 = nunca)
+LESSON_INDEX_REFRESH_S = float(os.getenv("LESSON_INDEX_REFRESH_S", "300"))
+SEARCH_DEFAULT_K = int(os.getenv("SEARCH_DEFAULT_K", "3"))
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "800"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_TTL_S = float(os.getenv("EMBEDDING_CACHE_TTL_S", "86400"))
+
+# Ingestão de lições em lesson_embeddings (python -m aia.ingest_lessons)
+INGEST_CHUNK_CHARS = int(os.getenv("INGEST_CHUNK_CHARS", "1200"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "150"))
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+
+# Contexto do aluno (lição, perfil, memórias) buscado junto com a conexão upstream
+STUDENT_CONTEXT_TIMEOUT_S = float(os.getenv("STUDENT_CONTEXT_TIMEOUT_S", "0.8"))
+STUDENT_CONTEXT_TOKENS = int(os.getenv("STUDENT_CONTEXT_TOKENS", "700"))
+STUDENT_CONTEXT_MEMORIES = int(os.getenv("STUDENT_CONTEXT_MEMORIES", "5"))
+
+# Memória de longo prazo (long_memory): candidatos por aluno em cache entre reconexões
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "2048"))
+MEMORY_CACHE_TTL_S = float(os.getenv("MEMORY_CACHE_TTL_S", "1800"))
+MEMORY_CANDIDATES = int(os.getenv("MEMORY_CANDIDATES", "50"))
+MEMORY_HALF_LIFE_DAYS = float(os.getenv("MEMORY_HALF_LIFE_DAYS", "14"))
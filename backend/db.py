@@ -1,16 +1,117 @@
 # db.py
+import asyncio
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from config import POSTGRES_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from logger import log_info, log_warn
+from config import (
+    POSTGRES_URL,
+    DB_PROFILE,
+    DB_ECHO,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT_S,
+    DB_POOL_RECYCLE_S,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE,
+)
 
 if not POSTGRES_URL:
     raise RuntimeError("POSTGRES_URL não está definido no .env")
 
-engine = create_async_engine(
-    POSTGRES_URL,
-    echo=True,          # pode deixar True por enquanto para debugar
-    future=True,
-)
+
+# Métricas do pool (lidas em runtime por pool_metrics)
+_pool_stats = {
+    "checkouts": 0,
+    "wait_total_s": 0.0,
+    "wait_max_s": 0.0,
+    "overflow_events": 0,
+    "timeouts": 0,
+    "connects": 0,
+    "connect_total_s": 0.0,
+    "connect_max_s": 0.0,
+}
+
+
+class MeteredAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Pool padrão do engine async, medindo o tempo de espera por conexão,
+    quantas vezes passou do pool_size (overflow) e quantos timeouts ocorreram.
+    Abrir uma conexão nova é medido à parte (connect) e não entra na espera.
+    """
+
+    _in_get = False
+    _connect_s = 0.0  # tempo de connect dentro do _do_get em andamento
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            elapsed = time.perf_counter() - start
+            self._connect_s += elapsed
+            _pool_stats["connects"] += 1
+            _pool_stats["connect_total_s"] += elapsed
+            if elapsed > _pool_stats["connect_max_s"]:
+                _pool_stats["connect_max_s"] = elapsed
+
+    def _do_get(self):
+        # O QueuePool chama _do_get recursivamente: mede só a chamada externa
+        if self._in_get:
+            return super()._do_get()
+        self._in_get = True
+        self._connect_s = 0.0
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            _pool_stats["timeouts"] += 1
+            raise
+        finally:
+            self._in_get = False
+
+        waited = time.perf_counter() - start - self._connect_s
+        _pool_stats["checkouts"] += 1
+        _pool_stats["wait_total_s"] += waited
+        if waited > _pool_stats["wait_max_s"]:
+            _pool_stats["wait_max_s"] = waited
+        if self.overflow() > 0:
+            _pool_stats["overflow_events"] += 1
+        return conn
+
+
+def _engine_options() -> dict:
+    production = DB_PROFILE == "production"
+    echo = DB_ECHO.lower() == "true" if DB_ECHO else not production
+
+    options = {
+        "echo": echo,   # no perfil dev fica True para debugar
+        "future": True,
+        "poolclass": MeteredAsyncPool,
+    }
+
+    if production:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT_S,
+            pool_recycle=DB_POOL_RECYCLE_S,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+
+        # Cache de prepared statements depende do driver
+        if "+asyncpg" in POSTGRES_URL:
+            options["connect_args"] = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+        elif "+psycopg" in POSTGRES_URL and DB_STATEMENT_CACHE_SIZE == 0:
+            options["connect_args"] = {"prepare_threshold": None}
+
+    return options
+
+
+engine = create_async_engine(POSTGRES_URL, **_engine_options())
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -18,3 +119,61 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 Base = declarative_base()
+
+
+def pool_metrics() -> dict:
+    pool = engine.pool
+    checkouts = _pool_stats["checkouts"]
+    return {
+        "profile": DB_PROFILE,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": checkouts,
+        "wait_avg_ms": (_pool_stats["wait_total_s"] / checkouts * 1000) if checkouts else 0.0,
+        "wait_max_ms": _pool_stats["wait_max_s"] * 1000,
+        "overflow_events": _pool_stats["overflow_events"],
+        "timeouts": _pool_stats["timeouts"],
+        "connects": _pool_stats["connects"],
+        "connect_avg_ms": (
+            _pool_stats["connect_total_s"] / _pool_stats["connects"] * 1000
+            if _pool_stats["connects"] else 0.0
+        ),
+        "connect_max_ms": _pool_stats["connect_max_s"] * 1000,
+    }
+
+
+async def listen_forever(channel: str, on_notify, on_connect=None, retry_s: float = 5.0):
+    """
+    LISTEN num canal do Postgres, numa conexão asyncpg dedicada (fora do pool).
+    on_notify(payload) roda no event loop a cada NOTIFY; on_connect() roda a
+    cada (re)conexão, já que os avisos enviados com a conexão caída se perdem.
+    """
+    try:
+        import asyncpg
+    except ImportError:
+        log_warn(f"LISTEN {channel} requer o pacote asyncpg; seguindo sem.")
+        return
+
+    dsn = POSTGRES_URL.replace("+asyncpg", "").replace("+psycopg", "")
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(dsn)
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _conn: closed.set())
+            await conn.add_listener(channel, lambda _conn, _pid, _channel, payload: on_notify(payload))
+            if on_connect:
+                on_connect()
+            log_info(f"👂 LISTEN {channel} ativo")
+            await closed.wait()
+            log_warn(f"Conexão do LISTEN {channel} caiu; reconectando...")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_warn(f"Erro no LISTEN {channel}: {e}")
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(retry_s)
@@ -3,45 +3,125 @@ import asyncio
 from logger import log_info, log_error
 from db import AsyncSessionLocal
 from models import Student
-from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from job_queue import create_job_queue
+from config import (
+    STUDENT_SYNC_WORKERS,
+    STUDENT_SYNC_BATCH_SIZE,
+    STUDENT_SYNC_BATCH_WAIT_MS,
+    STUDENT_SYNC_QUEUE,
+    STUDENT_SYNC_SQLITE_PATH,
+    STUDENT_SYNC_VISIBILITY_S,
+    STUDENT_SYNC_MAX_ATTEMPTS,
+    STUDENT_SYNC_RETRY_BACKOFF_S,
+    STUDENT_SYNC_POLL_MS,
+)
 
-student_sync_queue = asyncio.Queue()
+student_sync_queue = create_job_queue(
+    STUDENT_SYNC_QUEUE,
+    "student_sync",
+    sqlite_path=STUDENT_SYNC_SQLITE_PATH,
+    visibility_s=STUDENT_SYNC_VISIBILITY_S,
+    max_attempts=STUDENT_SYNC_MAX_ATTEMPTS,
+    retry_backoff_s=STUDENT_SYNC_RETRY_BACKOFF_S,
+    poll_ms=STUDENT_SYNC_POLL_MS,
+)
 
+# Métricas do worker (lidas por sync_stats)
+_stats = {
+    "batches": 0,
+    "synced": 0,
+    "failed_batches": 0,
+    "last_batch_size": 0,
+    "max_batch_size": 0,
+}
 
-def queue_student_sync(google_payload: dict):
-    student_sync_queue.put_nowait(google_payload)
+
+async def queue_student_sync(google_payload: dict):
+    try:
+        await student_sync_queue.put(google_payload)
+    except Exception as e:
+        # Login segue valendo; o aluno é sincronizado no próximo login
+        log_error(f"Erro ao agendar sincronização de {google_payload.get('email')}: {e}")
+        return
     log_info(f"Sincronização agendada para {google_payload.get('email')}")
 
 
-async def student_sync_worker():
-    log_info("DB Worker iniciado.")
+def sync_stats() -> dict:
+    return {
+        "backend": STUDENT_SYNC_QUEUE,
+        "queue_depth": student_sync_queue.depth(),
+        **_stats,
+    }
 
-    while True:
-        google_payload = await student_sync_queue.get()
-        email = google_payload.get("email")
+
+async def _upsert_students(payloads: list):
+    # Vários logins do mesmo aluno no lote viram uma linha só (o último vence)
+    rows = {}
+    for google_payload in payloads:
         google_id = google_payload.get("sub")
-        name = google_payload.get("name", "Usuário")
+        if not google_id:
+            continue
+        rows[google_id] = {
+            "id": google_id,
+            "email": google_payload.get("email"),
+            "name": google_payload.get("name", "Usuário"),
+        }
+    if not rows:
+        return 0
+
+    # Aluno existente fica como está (mesmo comportamento do SELECT + INSERT antigo).
+    # Também torna a reentrega de um job (fila durável) inofensiva.
+    stmt = insert(Student).values(list(rows.values())).on_conflict_do_nothing()
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(stmt)
+        await session.commit()
+
+    created = max(result.rowcount or 0, 0)
+    log_info(f"Sincronização em lote: {len(rows)} aluno(s), {created} novo(s) no banco")
+    return len(rows)
+
+
+async def student_sync_worker(
+    batch_size: int = STUDENT_SYNC_BATCH_SIZE,
+    batch_wait_ms: int = STUDENT_SYNC_BATCH_WAIT_MS,
+):
+    await student_sync_queue.setup()
+    log_info(f"DB Worker iniciado (fila: {STUDENT_SYNC_QUEUE}).")
+
+    while True:
+        jobs = await student_sync_queue.claim(batch_size, batch_wait_ms)
+        batch = [job.payload for job in jobs]
 
         try:
-            async with AsyncSessionLocal() as session:
-                result = await session.execute(
-                    select(Student).where(Student.id == google_id)
-                )
-                student = result.scalar_one_or_none()
-
-                if student:
-                    log_info(f"Usuário já existia no banco: {email}")
-                else:
-                    new_student = Student(
-                        id=google_id,
-                        email=email,
-                        name=name,
-                    )
-                    session.add(new_student)
-                    await session.commit()
-                    log_info(f"Novo usuário criado no banco: {email}")
+            synced = await _upsert_students(batch)
+        except Exception as e:
+            _stats["failed_batches"] += 1
+            emails = ", ".join(str(p.get("email")) for p in batch)
+            log_error(f"Erro ao sincronizar usuários ({emails}): {e}")
+            try:
+                await student_sync_queue.nack(jobs, str(e))
+            except Exception as nack_error:
+                # Sem nack, os jobs voltam sozinhos quando o visibility timeout vencer
+                log_error(f"Erro ao reagendar jobs de sincronização: {nack_error}")
+            continue
 
+        try:
+            await student_sync_queue.ack(jobs)
         except Exception as e:
-            log_error(f"Erro ao sincronizar usuário {email}: {e}")
+            # Os alunos já estão no banco; a reentrega só repete um upsert idempotente
+            log_error(f"Erro ao confirmar jobs de sincronização: {e}")
+
+        _stats["batches"] += 1
+        _stats["synced"] += synced
+        _stats["last_batch_size"] = len(batch)
+        _stats["max_batch_size"] = max(_stats["max_batch_size"], len(batch))
+
+
+def start_student_sync_workers(count: int = STUDENT_SYNC_WORKERS) -> list:
+    """Sobe `count` workers concorrentes consumindo a mesma fila."""
+    return [asyncio.create_task(student_sync_worker()) for _ in range(max(count, 1))]
+
 
-        student_sync_queue.task_done()
+async def close_student_sync_queue():
+    await student_sync_queue.close()
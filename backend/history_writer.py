@@ -0,0 +1,171 @@
+# history_writer.py
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from logger import log_info, log_warn, log_error
+from db import AsyncSessionLocal
+from models import ConversationHistory
+from config import (
+    HISTORY_FLUSH_ROWS,
+    HISTORY_FLUSH_INTERVAL_S,
+    HISTORY_MAX_BUFFER_ROWS,
+    HISTORY_ROW_MAX_ATTEMPTS,
+)
+
+
+class ConversationHistoryWriter:
+    """
+    Write-behind do histórico de conversa (tabela conversation_history).
+
+    O relay só chama `add` (sem I/O). As linhas ficam num buffer do nó e são
+    gravadas em lote (INSERT multi-linha) quando juntam HISTORY_FLUSH_ROWS ou a
+    cada HISTORY_FLUSH_INTERVAL_S, e também ao fim de cada sessão e no shutdown.
+    Se o banco falhar, as linhas voltam para o buffer (limitado a
+    HISTORY_MAX_BUFFER_ROWS; acima disso as mais antigas são descartadas).
+    Se o lote for recusado por uma linha inválida (ex.: student_id que ainda
+    não está em students), as linhas são gravadas uma a uma e só as recusadas
+    são retentadas, até HISTORY_ROW_MAX_ATTEMPTS vezes, antes de descartadas.
+    """
+
+    def __init__(
+        self,
+        flush_rows: int = HISTORY_FLUSH_ROWS,
+        flush_interval_s: float = HISTORY_FLUSH_INTERVAL_S,
+        max_buffer_rows: int = HISTORY_MAX_BUFFER_ROWS,
+        row_max_attempts: int = HISTORY_ROW_MAX_ATTEMPTS,
+    ):
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        self.max_buffer_rows = max_buffer_rows
+        self.row_max_attempts = row_max_attempts
+
+        self._rows = []
+        self._retry = []  # [(tentativas, linha)] recusadas individualmente
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+        # Métricas
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    @property
+    def buffered(self) -> int:
+        return len(self._rows)
+
+    def add(self, student_id: str, message_type: str, content: str):
+        content = (content or "").strip()
+        if not content:
+            return
+
+        self._rows.append({
+            "student_id": student_id,
+            "message_type": message_type,
+            "content": content,
+            "created_at": datetime.now(timezone.utc),
+        })
+        self._trim()
+        if len(self._rows) >= self.flush_rows:
+            self._wakeup.set()
+
+    def request_flush(self):
+        """Pede um flush sem esperar por ele (ex.: fim de sessão)."""
+        self._wakeup.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            rows, self._rows = self._rows, []
+            retry, self._retry = self._retry, []
+            if rows:
+                try:
+                    async with AsyncSessionLocal() as session:
+                        # executemany -> o SQLAlchemy agrupa em INSERTs multi-linha
+                        await session.execute(insert(ConversationHistory), rows)
+                        await session.commit()
+                    self.written += len(rows)
+                except IntegrityError as e:
+                    log_warn(f"⚠️ Lote de histórico recusado ({len(rows)} linhas), gravando linha a linha: {e.orig}")
+                    retry.extend((0, row) for row in rows)
+                except Exception as e:
+                    log_error(f"Erro ao gravar histórico ({len(rows)} linhas): {e}")
+                    # Devolve para a próxima tentativa, mantendo a ordem
+                    self._rows = rows + self._rows
+                    self._retry = retry + self._retry
+                    self._trim()
+                    return
+            if retry:
+                await self._insert_one_by_one(retry)
+
+    async def _insert_one_by_one(self, retry):
+        """Cada linha num SAVEPOINT: as recusadas não derrubam as outras."""
+        written, requeue, rejected = 0, [], []
+        try:
+            async with AsyncSessionLocal() as session:
+                for attempts, row in retry:
+                    try:
+                        async with session.begin_nested():
+                            await session.execute(insert(ConversationHistory), [row])
+                        written += 1
+                    except IntegrityError as e:
+                        attempts += 1
+                        if attempts < self.row_max_attempts:
+                            requeue.append((attempts, row))
+                        else:
+                            rejected.append((row, e))
+                await session.commit()
+        except Exception as e:
+            log_error(f"Erro ao gravar histórico linha a linha ({len(retry)} linhas): {e}")
+            # Nada foi commitado: todas voltam com a contagem de tentativas original
+            self._retry = list(retry) + self._retry
+            return
+
+        self.written += written
+        self._retry.extend(requeue)
+        for row, e in rejected:
+            self.rejected += 1
+            log_warn(
+                f"⚠️ Linha de histórico descartada após {self.row_max_attempts} tentativa(s): {e.orig}",
+                event="history_rejected",
+                student_id=row["student_id"],
+            )
+
+    def _trim(self):
+        overflow = len(self._rows) - self.max_buffer_rows
+        if overflow > 0:
+            del self._rows[:overflow]
+            self.dropped += overflow
+            log_warn(f"⚠️ Buffer de histórico cheio - {overflow} linha(s) descartada(s).")
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Blindado: o cancelamento no close() não interrompe um INSERT no meio
+            await asyncio.shield(self.flush())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Espera o flush em andamento (lock) e grava o que sobrou
+        await self.flush()
+        log_info(f"Histórico: {self.written} linha(s) gravada(s) neste processo.")
+
+
+# Um buffer por processo
+history_writer = ConversationHistoryWriter()
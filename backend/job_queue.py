@@ -0,0 +1,313 @@
+# job_queue.py
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from logger import log_warn, log_error
+
+
+@dataclass(slots=True)
+class Job:
+    id: Any
+    payload: dict
+    attempts: int = 0
+
+
+class MemoryJobQueue:
+    """
+    Fila em memória (asyncio.Queue): só vale para um processo e perde o que
+    estiver pendente se ele cair. Mesma interface das filas duráveis.
+    """
+
+    durable = False
+
+    def __init__(self, max_attempts: int = 5, retry_backoff_s: float = 2.0):
+        self.max_attempts = max_attempts
+        self.retry_backoff_s = retry_backoff_s
+        self._queue = asyncio.Queue()
+        self._next_id = 0
+        self.dead = 0
+
+    async def setup(self):
+        return
+
+    async def put(self, payload: dict):
+        self._next_id += 1
+        self._queue.put_nowait(Job(self._next_id, payload))
+
+    async def claim(self, max_items: int, wait_ms: int) -> List[Job]:
+        """
+        Espera o primeiro job e depois junta mais até `max_items` itens
+        ou até `wait_ms` ms, o que vier primeiro.
+        """
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_ms / 1000
+
+        while len(batch) < max_items:
+            # Drena o que já está na fila sem esperar
+            while len(batch) < max_items and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if len(batch) >= max_items:
+                break
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        for job in batch:
+            job.attempts += 1
+        return batch
+
+    async def ack(self, jobs: List[Job]):
+        for _ in jobs:
+            self._queue.task_done()
+
+    async def nack(self, jobs: List[Job], error: str = ""):
+        loop = asyncio.get_running_loop()
+        for job in jobs:
+            self._queue.task_done()
+            if job.attempts < self.max_attempts:
+                delay = self.retry_backoff_s * 2 ** (job.attempts - 1)
+                loop.call_later(delay, self._queue.put_nowait, job)
+            else:
+                self.dead += 1
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self):
+        return
+
+
+class SqlJobQueue:
+    """
+    Fila durável numa tabela (job_queue), compartilhada por todos os workers
+    uvicorn / nós que apontam para o mesmo banco.
+
+    - claim: marca até N jobs disponíveis como "em uso" empurrando o available_at
+      para agora + visibility_s (no Postgres com FOR UPDATE SKIP LOCKED, então
+      workers concorrentes pegam lotes disjuntos sem esperar uns aos outros).
+    - ack: apaga os jobs processados.
+    - Se o worker cair antes do ack, o job volta a ficar visível quando o
+      visibility timeout vence. nack reagenda com backoff exponencial e, passado
+      max_attempts, o job fica como 'dead' na tabela para inspeção.
+
+    A entrega é "pelo menos uma vez": o processamento precisa ser idempotente.
+    No SQLite (substituto local, um arquivo) não existe SKIP LOCKED; o próprio
+    lock de escrita do banco serializa os claims.
+    """
+
+    durable = True
+
+    _DDL = {
+        "postgresql": """
+            CREATE TABLE IF NOT EXISTS job_queue (
+                id BIGSERIAL PRIMARY KEY,
+                queue TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'ready',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at DOUBLE PRECISION NOT NULL,
+                last_error TEXT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            )
+        """,
+        "sqlite": """
+            CREATE TABLE IF NOT EXISTS job_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'ready',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                last_error TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+    }
+    _INDEX = (
+        "CREATE INDEX IF NOT EXISTS idx_job_queue_ready "
+        "ON job_queue (queue, status, available_at)"
+    )
+
+    def __init__(
+        self,
+        engine,
+        queue: str,
+        visibility_s: float = 30.0,
+        max_attempts: int = 5,
+        retry_backoff_s: float = 2.0,
+        poll_ms: int = 500,
+        owns_engine: bool = False,
+    ):
+        self.engine = engine
+        self.owns_engine = owns_engine
+        self.queue = queue
+        self.visibility_s = visibility_s
+        self.max_attempts = max_attempts
+        self.retry_backoff_s = retry_backoff_s
+        self.poll_ms = poll_ms
+        self.dialect = engine.dialect.name
+
+        # Acorda os workers deste processo na hora, sem esperar o próximo poll
+        self._wakeup = asyncio.Event()
+        self._setup_lock = asyncio.Lock()
+        self._ready = False
+        self._depth = 0
+        self._depth_at = 0.0
+
+    async def setup(self):
+        async with self._setup_lock:
+            if self._ready:
+                return
+            async with self.engine.begin() as conn:
+                await conn.execute(text(self._DDL[self.dialect]))
+                await conn.execute(text(self._INDEX))
+            self._ready = True
+
+    async def put(self, payload: dict):
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "INSERT INTO job_queue (queue, payload, available_at) "
+                    "VALUES (:queue, :payload, :now)"
+                ),
+                {"queue": self.queue, "payload": json.dumps(payload), "now": time.time()},
+            )
+        self._wakeup.set()
+
+    async def _claim_once(self, max_items: int) -> List[Job]:
+        now = time.time()
+        lock = " FOR UPDATE SKIP LOCKED" if self.dialect == "postgresql" else ""
+        stmt = text(
+            "UPDATE job_queue SET available_at = :until, attempts = attempts + 1 "
+            "WHERE id IN ("
+            "  SELECT id FROM job_queue"
+            "  WHERE queue = :queue AND status = 'ready' AND available_at <= :now"
+            f"  ORDER BY id LIMIT :limit{lock}"
+            ") RETURNING id, payload, attempts"
+        )
+        async with self.engine.begin() as conn:
+            result = await conn.execute(stmt, {
+                "queue": self.queue,
+                "now": now,
+                "until": now + self.visibility_s,
+                "limit": max_items,
+            })
+            rows = result.all()
+        return [Job(row.id, json.loads(row.payload), row.attempts) for row in rows]
+
+    async def claim(self, max_items: int, wait_ms: int) -> List[Job]:
+        """
+        Espera até haver jobs visíveis (poll a cada poll_ms, ou na hora quando
+        este processo enfileira) e, se o lote veio incompleto, espera `wait_ms`
+        mais uma vez para juntar mais.
+        """
+        while True:
+            self._wakeup.clear()
+            # Também com a fila cheia (lotes sempre completos), quando a métrica importa
+            await self._refresh_depth()
+            try:
+                batch = await self._claim_once(max_items)
+            except Exception as e:
+                log_error(f"Erro ao buscar jobs da fila {self.queue}: {e}")
+                batch = []
+            if batch:
+                break
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+
+        if len(batch) < max_items and wait_ms > 0:
+            await asyncio.sleep(wait_ms / 1000)
+            try:
+                batch += await self._claim_once(max_items - len(batch))
+            except Exception as e:
+                log_warn(f"Erro ao completar lote da fila {self.queue}: {e}")
+        return batch
+
+    async def ack(self, jobs: List[Job]):
+        if not jobs:
+            return
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text("DELETE FROM job_queue WHERE id = :id"),
+                [{"id": job.id} for job in jobs],
+            )
+
+    async def nack(self, jobs: List[Job], error: str = ""):
+        if not jobs:
+            return
+        now = time.time()
+        params = []
+        for job in jobs:
+            dead = job.attempts >= self.max_attempts
+            params.append({
+                "id": job.id,
+                "status": "dead" if dead else "ready",
+                "at": now + self.retry_backoff_s * 2 ** (job.attempts - 1),
+                "error": error[:1000],
+            })
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "UPDATE job_queue SET status = :status, available_at = :at, "
+                    "last_error = :error WHERE id = :id"
+                ),
+                params,
+            )
+
+    async def _refresh_depth(self, every_s: float = 5.0):
+        if time.monotonic() - self._depth_at < every_s:
+            return
+        self._depth_at = time.monotonic()
+        try:
+            async with self.engine.connect() as conn:
+                self._depth = await conn.scalar(
+                    text("SELECT count(*) FROM job_queue WHERE queue = :queue AND status = 'ready'"),
+                    {"queue": self.queue},
+                )
+        except Exception as e:
+            log_warn(f"Erro ao medir a fila {self.queue}: {e}")
+
+    def depth(self) -> int:
+        """Último tamanho medido (atualizado pelos workers a cada claim, no máximo a cada 5 s)."""
+        return self._depth
+
+    async def close(self):
+        if self.owns_engine:
+            await self.engine.dispose()
+
+
+def create_job_queue(backend: str, queue: str, sqlite_path: str = None, **options):
+    """
+    memory   -> MemoryJobQueue (um processo só)
+    postgres -> SqlJobQueue no mesmo banco da aplicação
+    sqlite   -> SqlJobQueue num arquivo local (requer aiosqlite)
+    """
+    if backend == "memory":
+        return MemoryJobQueue(
+            max_attempts=options.get("max_attempts", 5),
+            retry_backoff_s=options.get("retry_backoff_s", 2.0),
+        )
+    if backend == "postgres":
+        from db import engine
+        return SqlJobQueue(engine, queue, **options)
+    if backend == "sqlite":
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{sqlite_path}",
+            connect_args={"timeout": 30},  # espera o lock de escrita em vez de falhar
+        )
+        return SqlJobQueue(engine, queue, owns_engine=True, **options)
+    raise ValueError(f"Backend de fila desconhecido: {backend}")
@@ -1,14 +1,142 @@
 # logger.py
+import atexit
+import contextvars
 import datetime
+import json
+import queue
+import random
+import sys
+import threading
+import time
 
-def _ts():
-    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+from config import (
+    LOG_FILE,
+    LOG_STDOUT,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_RATES,
+    LOG_RATE_LIMITS,
+)
 
-def log_info(msg: str):
-    print(f"[INFO { _ts() }] {msg}")
+# Contexto da sessão atual (propaga para as tasks criadas dentro do /ws)
+_session_id = contextvars.ContextVar("session_id", default=None)
+_student_id = contextvars.ContextVar("student_id", default=None)
 
-def log_warn(msg: str):
-    print(f"[WARN { _ts() }] {msg}")
+_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_STOP = object()
 
-def log_error(msg: str):
-    print(f"[ERROR { _ts() }] {msg}")
+_dropped = 0
+_buckets = {}  # event -> [tokens, last_refill]
+
+
+def bind_log_context(session_id: str = None, student_id: str = None):
+    """Associa session_id/student_id a todos os logs do contexto atual."""
+    if session_id is not None:
+        _session_id.set(session_id)
+    if student_id is not None:
+        _student_id.set(student_id)
+
+
+def _allowed(event: str) -> bool:
+    """Amostragem + token bucket por tipo de evento (só para INFO/WARN)."""
+    rate = LOG_SAMPLE_RATES.get(event)
+    if rate is not None and random.random() >= rate:
+        return False
+
+    limit = LOG_RATE_LIMITS.get(event)
+    if limit is None:
+        return True
+
+    now = time.monotonic()
+    bucket = _buckets.get(event)
+    if bucket is None:
+        bucket = _buckets[event] = [limit, now]
+    bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * limit)
+    bucket[1] = now
+    if bucket[0] < 1:
+        return False
+    bucket[0] -= 1
+    return True
+
+
+def _log(level: str, msg: str, event: str = None, fields: dict = None):
+    global _dropped
+    if event and level != "ERROR" and not _allowed(event):
+        return
+
+    record = {
+        "ts": time.time(),
+        "level": level,
+        "message": msg,
+        "event": event,
+        "session_id": _session_id.get(),
+        "student_id": _student_id.get(),
+    }
+    if fields:
+        record.update(fields)
+
+    try:
+        _queue.put_nowait(record)
+    except queue.Full:
+        # Nunca bloqueia o event loop por causa de log
+        _dropped += 1
+
+
+def _format_text(record: dict, ts: datetime.datetime) -> str:
+    return f"[{record['level']} {ts.strftime('%Y-%m-%d %H:%M:%S')}] {record['message']}"
+
+
+def _writer():
+    global _dropped
+    log_file = open(LOG_FILE, "a", encoding="utf-8") if LOG_FILE else None
+    try:
+        while True:
+            record = _queue.get()
+            if record is _STOP:
+                break
+
+            ts = datetime.datetime.fromtimestamp(record.pop("ts"))
+            record = {"timestamp": ts.isoformat(), **{k: v for k, v in record.items() if v is not None}}
+            line = json.dumps(record, ensure_ascii=False, default=str)
+
+            if log_file:
+                log_file.write(line + "\n")
+            if LOG_STDOUT == "json":
+                sys.stdout.write(line + "\n")
+            elif LOG_STDOUT == "text":
+                sys.stdout.write(_format_text(record, ts) + "\n")
+
+            # Só faz flush quando a fila esvazia (agrupa as escritas)
+            if _queue.empty():
+                if _dropped:
+                    dropped, _dropped = _dropped, 0
+                    sys.stderr.write(f"[WARN] {dropped} linha(s) de log descartada(s): fila cheia\n")
+                if log_file:
+                    log_file.flush()
+                sys.stdout.flush()
+    finally:
+        if log_file:
+            log_file.close()
+
+
+_thread = threading.Thread(target=_writer, name="aia-logger", daemon=True)
+_thread.start()
+
+
+@atexit.register
+def _shutdown():
+    # Escreve o que falta antes de sair
+    try:
+        _queue.put(_STOP, timeout=1)
+    except queue.Full:
+        return
+    _thread.join(timeout=2)
+
+
+def log_info(msg: str, event: str = None, **fields):
+    _log("INFO", msg, event, fields)
+
+def log_warn(msg: str, event: str = None, **fields):
+    _log("WARN", msg, event, fields)
+
+def log_error(msg: str, event: str = None, **fields):
+    _log("ERROR", msg, event, fields)
@@ -1,27 +1,106 @@
 import asyncio
 import json
 import base64
-import websockets
+import time
+import uuid
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 # --- IMPORTS DO PROJETO ---
-from auth import verify_google_credential, create_aia_token, decode_aia_token
-from logger import log_info, log_error
-from db_worker import queue_student_sync, student_sync_worker
-from config import OPENAI_API_KEY, REALTIME_MODEL
+from auth import verify_google_credential_async, create_aia_token, decode_aia_token, auth_stats
+from logger import log_info, log_warn, log_error, bind_log_context
+from audio_ingest import AudioChunker, bytes_to_ms
+from audio_codec import ClientCodec
+from audio_pacer import OutboundAudioPacer
+from vad_gate import VoiceActivityGate, prepare_vad_gate
+from relay import RelayChannel
+from tool_runner import ToolCallRunner
+from realtime_pool import get_realtime_pool, close_realtime_pools
+from db_worker import queue_student_sync, start_student_sync_workers, sync_stats, close_student_sync_queue
+from db import pool_metrics
+from history_writer import history_writer
+from aia.vector_index import keep_lesson_index_fresh
+from aia.student_context import prefetch_student_context, realtime_instructions
+from metrics import (
+    Gauge,
+    CounterFunc,
+    render_metrics,
+    monitor_event_loop_lag,
+    UPSTREAM_CONNECT_SECONDS,
+    TIME_TO_FIRST_AUDIO_SECONDS,
+    RESPONSE_LATENCY_SECONDS,
+    RELAY_BYTES,
+    RELAY_FRAMES,
+    SESSIONS_TOTAL,
+    BARGE_IN_TOTAL,
+    CANCELLED_DELTAS_TOTAL,
+    UPLINK,
+    DOWNLINK,
+)
+from config import (
+    REALTIME_MODEL,
+    SERVER_VAD_GATE,
+    TTS_WARM_ON_STARTUP,
+    SEARCH_LOCAL_INDEX,
+    RELAY_UPSTREAM_QUEUE_SIZE,
+    RELAY_UPSTREAM_POLICY,
+    RELAY_DOWNSTREAM_QUEUE_SIZE,
+    RELAY_DOWNSTREAM_POLICY,
+)
 
 # Tenta importar tools de 'aia.tools' ou da raiz 'tools'
 try:
-    from aia.tools import TOOLS_SCHEMA, execute_tool
+    from aia.tools import TOOLS_SCHEMA, execute_tool, watch_lesson_changes
 except ImportError:
     from tools import TOOLS_SCHEMA, execute_tool
+    watch_lesson_changes = None
 
 app = FastAPI(title="AIA Voice Engine (Realtime + Barge-In)")
 
-# URL da API Realtime
-REALTIME_URL = f"wss://api.openai.com/v1/realtime?model={REALTIME_MODEL}"
+# ==========================================
+# CONFIGURAÇÃO BASE DA SESSÃO (VAD AJUSTADO)
+# ==========================================
+# Enviada logo que a conexão é aberta (inclusive nas pré-aquecidas do pool)
+BASE_SESSION_CONFIG = {
+    "modalities": ["audio", "text"],
+    "voice": "alloy",
+    "input_audio_format": "pcm16",
+    "output_audio_format": "pcm16",
+    # Transcrição da fala do aluno (vai para conversation_history)
+    "input_audio_transcription": {"model": "whisper-1"},
+    "turn_detection": {
+        "type": "server_vad",
+        "threshold": 0.6,            # Mais alto = ignora respiração/ruído
+        "prefix_padding_ms": 300,    # Salva um pouco antes da fala para não cortar
+        "silence_duration_ms": 500,  # Tempo de silêncio para considerar fim de frase
+        "create_response": True
+    },
+    "tools": TOOLS_SCHEMA,
+    "tool_choice": "auto",
+}
+
+# Conexões Realtime pré-aquecidas (TLS + handshake + session.update base)
+realtime_pool = get_realtime_pool(REALTIME_MODEL, base_session=BASE_SESSION_CONFIG)
+
+# Sessões /ws ativas neste nó e as filas (RelayChannel) delas
+_active_sessions = set()
+_active_channels = set()
+
+Gauge("aia_active_sessions", "Sessões /ws ativas.", lambda: len(_active_sessions))
+Gauge("aia_relay_queue_depth", "Itens pendentes nas filas do relay (todas as sessões).",
+      lambda: sum(ch.depth for ch in _active_channels))
+Gauge("aia_realtime_pool_idle", "Conexões Realtime pré-aquecidas disponíveis.", lambda: realtime_pool.idle)
+Gauge("aia_db_pool_checked_out", "Conexões do banco em uso.", lambda: pool_metrics()["checked_out"])
+CounterFunc("aia_db_pool_overflow_events_total", "Checkouts acima do pool_size.",
+            lambda: pool_metrics()["overflow_events"])
+Gauge("aia_db_pool_wait_max_seconds", "Maior espera por conexão livre do banco (sem o connect).",
+      lambda: pool_metrics()["wait_max_ms"] / 1000)
+Gauge("aia_db_pool_connect_max_seconds", "Maior tempo para abrir uma conexão nova com o banco.",
+      lambda: pool_metrics()["connect_max_ms"] / 1000)
+Gauge("aia_history_buffered_rows", "Linhas de histórico aguardando gravação.", lambda: history_writer.buffered)
+Gauge("aia_student_sync_queue_depth", "Logins aguardando sincronização.", lambda: sync_stats()["queue_depth"])
+Gauge("aia_google_certs_fetches", "Downloads dos certificados do Google (fora do cache).", lambda: auth_stats()["google_certs_fetches"])
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,15 +113,37 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     log_info("🔧 Iniciando DB Worker...")
-    asyncio.create_task(student_sync_worker())
+    start_student_sync_workers()
+    realtime_pool.start()
+    history_writer.start()
+    prepare_vad_gate()
+    if watch_lesson_changes:
+        asyncio.create_task(watch_lesson_changes())
+    if SEARCH_LOCAL_INDEX != "off":
+        asyncio.create_task(keep_lesson_index_fresh())
+    asyncio.create_task(monitor_event_loop_lag())
+    if TTS_WARM_ON_STARTUP:
+        # Só o fallback sem Realtime usa o TTS; importa sob demanda
+        from aia.orchestrator.graph import warm_tts_cache
+        asyncio.create_task(warm_tts_cache())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_realtime_pools()
+    await history_writer.close()
+    await close_student_sync_queue()
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 @app.post("/auth/google")
 async def google_auth(data: dict):
     try:
         cred = data.get("credential")
-        payload = verify_google_credential(cred)
+        payload = await verify_google_credential_async(cred)
         token = create_aia_token(payload)
-        queue_student_sync(payload)
+        await queue_student_sync(payload)
         return JSONResponse({"status": "OK", "token": token, "name": payload.get("name"), "email": payload.get("email")})
     except Exception as e:
         log_error(f"Erro Auth: {e}")
@@ -67,72 +168,207 @@ async def websocket_endpoint(websocket: WebSocket):
         await websocket.close(code=4002)
         return
 
-    log_info(f"🔊 Conectado: {student_name}")
+    bind_log_context(session_id=uuid.uuid4().hex[:12], student_id=student_id)
+
+    # Codec da perna navegador <-> backend (a OpenAI sempre fala PCM16 24 kHz)
+    try:
+        codec = ClientCodec.from_query(websocket.query_params.get("codec"))
+    except ValueError as e:
+        log_warn(f"{e} - usando pcm16")
+        codec = ClientCodec()
+
+    log_info(f"🔊 Conectado: {student_name}", event="connect", codec=codec.name)
+    SESSIONS_TOTAL.inc()
+    _active_sessions.add(websocket)
+    connect_started = time.perf_counter()
 
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "OpenAI-Beta": "realtime=v1",
-    }
+    # Lição, perfil e memórias do aluno vêm do banco enquanto a conexão
+    # upstream é obtida (pool ou handshake novo)
+    context_task = asyncio.create_task(prefetch_student_context(student_id))
 
     try:
-        async with websockets.connect(REALTIME_URL, extra_headers=headers) as openai_ws:
-            log_info("✅ Conectado à OpenAI Realtime API")
+        async with realtime_pool.connection() as openai_ws:
+            connect_s = time.perf_counter() - connect_started
+            UPSTREAM_CONNECT_SECONDS.observe(connect_s)
+            log_info("✅ Conectado à OpenAI Realtime API", event="upstream_connect",
+                     connect_ms=round(connect_s * 1000, 1))
 
             # ==========================================
-            # 1. CONFIGURAÇÃO DA SESSÃO (VAD AJUSTADO)
+            # 1. CONFIGURAÇÃO DA SESSÃO DO ALUNO
             # ==========================================
+            # A parte fixa (voz, formatos, VAD, tools) já foi enviada na abertura
+            # da conexão pelo pool; aqui só entra o que depende do aluno,
+            # com o contexto já embutido (sem round trip de tool na 1ª pergunta).
+            context = await context_task
             session_config = {
                 "type": "session.update",
                 "session": {
-                    "modalities": ["audio", "text"],
-                    "instructions": (
-                        f"Você é o Tutor AIA. O aluno é {student_name}. "
-                        "Fale português do Brasil. Seja breve, simpático e didático. "
-                        "Responda de forma direta. "
-                        "Use a tool 'get_current_lesson' se precisar saber o conteúdo."
-                    ),
-                    "voice": "alloy",
-                    "input_audio_format": "pcm16",
-                    "output_audio_format": "pcm16",
-                    "turn_detection": {
-                        "type": "server_vad",
-                        "threshold": 0.6,            # Mais alto = ignora respiração/ruído
-                        "prefix_padding_ms": 300,    # Salva um pouco antes da fala para não cortar
-                        "silence_duration_ms": 500,  # Tempo de silêncio para considerar fim de frase
-                        "create_response": True
-                    },
-                    "tools": TOOLS_SCHEMA,
-                    "tool_choice": "auto",
+                    "instructions": realtime_instructions(student_name, context),
                 }
             }
             await openai_ws.send(json.dumps(session_config))
+            await websocket.send_text(json.dumps(codec.describe()))
 
             # ==========================================
-            # 2. LOOP CLIENTE -> OPENAI
+            # 2. FILAS POR DIREÇÃO (BACKPRESSURE)
             # ==========================================
+            async def send_to_client(payload):
+                if isinstance(payload, (bytes, bytearray)):
+                    await websocket.send_bytes(payload)
+                else:
+                    await websocket.send_text(payload)
+
+            upstream = RelayChannel(
+                "cliente->openai", openai_ws.send,
+                RELAY_UPSTREAM_QUEUE_SIZE, RELAY_UPSTREAM_POLICY,
+            )
+            downstream = RelayChannel(
+                "openai->cliente", send_to_client,
+                RELAY_DOWNSTREAM_QUEUE_SIZE, RELAY_DOWNSTREAM_POLICY,
+            )
+            _active_channels.update((upstream, downstream))
+
+            # ==========================================
+            # 3. LOOP CLIENTE -> OPENAI
+            # ==========================================
+            uplink_bytes = RELAY_BYTES.labels(UPLINK)
+            uplink_frames = RELAY_FRAMES.labels(UPLINK)
+            downlink_bytes = RELAY_BYTES.labels(DOWNLINK)
+            downlink_frames = RELAY_FRAMES.labels(DOWNLINK)
+
+            # Totais desta sessão (vão no log de encerramento)
+            totals = {
+                "bytes_up": 0, "bytes_down": 0, "frames_up": 0, "frames_down": 0, "ttfa_ms": [],
+                "barge_ins": 0, "cancelled_deltas": 0,
+            }
+
+            async def send_audio_chunk(chunk: bytes):
+                uplink_bytes.inc(len(chunk))
+                uplink_frames.inc()
+                totals["bytes_up"] += len(chunk)
+                totals["frames_up"] += 1
+                b64_audio = base64.b64encode(chunk).decode("utf-8")
+                event = {
+                    "type": "input_audio_buffer.append",
+                    "audio": b64_audio
+                }
+                await upstream.put(json.dumps(event), droppable=True)
+
+            # Áudio do tutor: frames de OUTBOUND_FRAME_MS, no ritmo da reprodução
+            async def send_audio_frame(pcm: bytes):
+                audio_bytes = codec.encode_downlink(pcm)
+                downlink_bytes.inc(len(audio_bytes))
+                downlink_frames.inc()
+                totals["bytes_down"] += len(audio_bytes)
+                totals["frames_down"] += 1
+                await downstream.put(audio_bytes, droppable=True)
+
+            pacer = OutboundAudioPacer(send_audio_frame)
+
+            # Tools rodam em tarefas próprias; resultados vão pela fila upstream
+            tool_runner = ToolCallRunner(execute_tool, student_id, upstream.put)
+
+            # Agrupa os frames do microfone em blocos de AUDIO_CHUNK_MS
+            chunker = AudioChunker(send_audio_chunk)
+
+            # Gate de voz opcional: silêncio do microfone não sobe para a OpenAI
+            vad_gate = VoiceActivityGate(chunker.push) if SERVER_VAD_GATE != "off" else None
+            ingest_audio = vad_gate.push if vad_gate else chunker.push
+
             async def receive_from_client():
                 try:
                     while True:
                         message = await websocket.receive()
-                        
-                        if "bytes" in message:
-                            data = message["bytes"]
-                            if len(data) > 0:
-                                b64_audio = base64.b64encode(data).decode("utf-8")
-                                event = {
-                                    "type": "input_audio_buffer.append",
-                                    "audio": b64_audio
-                                }
-                                await openai_ws.send(json.dumps(event))
-                                
+                        if message.get("type") == "websocket.disconnect":
+                            raise WebSocketDisconnect(message.get("code", 1000))
+
+                        if message.get("bytes"):
+                            await ingest_audio(codec.decode_uplink(message["bytes"]))
+
                 except WebSocketDisconnect:
-                    log_info("🔌 Cliente desconectou.")
+                    log_info("🔌 Cliente desconectou.", event="disconnect")
                 except Exception as e:
                     log_error(f"Erro Client->OpenAI: {e}")
 
             # ==========================================
-            # 3. LOOP OPENAI -> CLIENTE
+            # 4. LOOP OPENAI -> CLIENTE
             # ==========================================
+            # Marcos do turno atual (para time-to-first-audio)
+            turn = {"speech_started": None, "speech_stopped": None}
+
+            # Resposta em andamento e item de áudio tocando (para o barge-in)
+            playback = {
+                "response_id": None,
+                "active": False,     # entre response.created e response.done
+                "item_id": None,
+                "generated": {},     # item_id -> ms de áudio gerado pela OpenAI
+                "cancelled": None,   # response_id cancelada: deltas dela são descartados
+                "transcripts": {},   # item_id -> transcrição aguardando saber quanto foi ouvido
+                "heard": {},         # item_id -> fração ouvida, para transcrições que ainda vão chegar
+            }
+
+            def store_assistant_transcript(transcript: str, fraction: float):
+                """
+                Grava só o que o aluno ouviu. O corte é proporcional ao áudio
+                tocado (aproximação: a transcrição não traz tempos por palavra).
+                """
+                if fraction < 1.0:
+                    cut = (transcript or "")[:int(len(transcript or "") * fraction)]
+                    cut = cut[:cut.rfind(" ")].rstrip() if " " in cut else ""
+                    transcript = f"{cut}…" if cut else ""
+                history_writer.add(student_id, "assistant", transcript)
+
+            def settle_transcripts():
+                """
+                Nova fala do aluno ou fim da sessão: fecha quanto de cada item do
+                tutor foi ouvido e grava as transcrições pendentes.
+                """
+                for item_id, generated_ms in playback["generated"].items():
+                    heard_ms = pacer.heard_ms(item_id)
+                    # Tolerância de 1 ms para a soma dos frames em ponto flutuante
+                    playback["heard"][item_id] = 1.0 if heard_ms >= generated_ms - 1 else heard_ms / generated_ms
+                playback["generated"].clear()
+
+                for item_id, transcript in playback["transcripts"].items():
+                    store_assistant_transcript(transcript, playback["heard"].pop(item_id, 1.0))
+                playback["transcripts"].clear()
+
+                # Itens cuja transcrição nunca chegou não ficam para sempre
+                while len(playback["heard"]) > 16:
+                    playback["heard"].pop(next(iter(playback["heard"])))
+
+            async def interrupt_response():
+                """
+                Barge-in: cala o cliente, cancela a resposta que ainda está sendo
+                gerada e corta o item do assistente no ponto que o aluno ouviu,
+                para o contexto do modelo bater com o que foi de fato falado.
+                """
+                item_id = playback["item_id"]
+                generated_ms = playback["generated"].get(item_id, 0.0)
+                heard_ms = pacer.heard_ms(item_id) if item_id else 0.0
+                settle_transcripts()
+
+                # Descarta o áudio que ainda não saiu e manda o Frontend calar
+                pacer.clear()
+                downstream.clear_droppable()
+                await downstream.put(json.dumps({"type": "interrupt"}), urgent=True)
+
+                if playback["active"]:
+                    await upstream.put(json.dumps({"type": "response.cancel"}), urgent=True)
+                    playback["cancelled"] = playback["response_id"]
+                    playback["active"] = False
+
+                if item_id and heard_ms < generated_ms - 1:
+                    await upstream.put(json.dumps({
+                        "type": "conversation.item.truncate",
+                        "item_id": item_id,
+                        "content_index": 0,
+                        "audio_end_ms": int(heard_ms),
+                    }))
+                    log_info("✂️ Resposta cortada no ponto ouvido", event="truncate",
+                             heard_ms=int(heard_ms), generated_ms=int(generated_ms))
+                playback["item_id"] = None
+
             async def receive_from_openai():
                 try:
                     async for raw_msg in openai_ws:
@@ -141,51 +377,122 @@ async def websocket_endpoint(websocket: WebSocket):
 
                         # A. INTERRUPÇÃO (BARGE-IN)
                         if evt_type == "input_audio_buffer.speech_started":
-                            log_info("🗣️ Fala detectada - Interrompendo áudio...")
-                            
-                            # 1. Manda o Frontend calar a boca imediatamente
-                            await websocket.send_text(json.dumps({"type": "interrupt"}))
-                            
-                            # 2. Opcional: Limpa o buffer da OpenAI para ela parar de processar o áudio antigo
-                            await openai_ws.send(json.dumps({"type": "input_audio_buffer.clear"}))
+                            log_info("🗣️ Fala detectada - Interrompendo áudio...", event="barge_in")
+                            turn["speech_started"] = time.perf_counter()
+                            turn["speech_stopped"] = None
+
+                            # Cancela tools em andamento e a resposta que estava tocando.
+                            # O input_audio_buffer não é limpo: ele já contém o início
+                            # da fala nova que o server VAD acabou de detectar.
+                            tool_runner.cancel_all()
+                            BARGE_IN_TOTAL.inc()
+                            totals["barge_ins"] += 1
+                            await interrupt_response()
+
+                        elif evt_type == "response.created":
+                            response_id = event.get("response", {}).get("id")
+                            playback["response_id"] = response_id
+                            playback["active"] = True
+                            if response_id != playback["cancelled"]:
+                                playback["cancelled"] = None
+
+                        elif evt_type == "response.done":
+                            if event.get("response", {}).get("id") == playback["response_id"]:
+                                playback["active"] = False
+
+                        elif evt_type == "input_audio_buffer.speech_stopped":
+                            turn["speech_stopped"] = time.perf_counter()
 
                         # B. Áudio chegando (Stream)
                         elif evt_type == "response.audio.delta":
                             audio_b64 = event.get("delta", "")
-                            if audio_b64:
+                            if audio_b64 and playback["cancelled"] and event.get("response_id") == playback["cancelled"]:
+                                # Sobra da resposta cancelada: não decodifica nem envia
+                                CANCELLED_DELTAS_TOTAL.inc()
+                                totals["cancelled_deltas"] += 1
+                            elif audio_b64:
+                                if turn["speech_started"] is not None:
+                                    now = time.perf_counter()
+                                    ttfa = now - turn["speech_started"]
+                                    TIME_TO_FIRST_AUDIO_SECONDS.observe(ttfa)
+                                    totals["ttfa_ms"].append(round(ttfa * 1000))
+                                    if turn["speech_stopped"] is not None:
+                                        RESPONSE_LATENCY_SECONDS.observe(now - turn["speech_stopped"])
+                                    turn["speech_started"] = turn["speech_stopped"] = None
+
+                                item_id = event.get("item_id")
                                 audio_bytes = base64.b64decode(audio_b64)
-                                await websocket.send_bytes(audio_bytes)
+                                playback["item_id"] = item_id
+                                generated = playback["generated"]
+                                generated[item_id] = generated.get(item_id, 0.0) + bytes_to_ms(len(audio_bytes))
+                                pacer.add(item_id, audio_bytes)
+
+                        elif evt_type == "response.audio.done":
+                            pacer.end_item(event.get("item_id"))
 
-                        # C. Execução de Ferramentas (Tools)
+                        # C. Execução de Ferramentas (Tools) - fora do loop de áudio
                         elif evt_type == "response.function_call_arguments.done":
-                            call_id = event["call_id"]
-                            f_name = event["name"]
-                            args = json.loads(event["arguments"])
-                            
-                            log_info(f"🤖 Executando Tool: {f_name}")
-                            result = await execute_tool(f_name, args, student_id)
-                            
-                            # Devolve o resultado para a IA
-                            await openai_ws.send(json.dumps({
-                                "type": "conversation.item.create",
-                                "item": {
-                                    "type": "function_call_output",
-                                    "call_id": call_id,
-                                    "output": result
-                                }
-                            }))
-                            # Força a geração de resposta
-                            await openai_ws.send(json.dumps({"type": "response.create"}))
-
-                        # D. Erros
+                            tool_runner.submit(event["call_id"], event["name"], event["arguments"])
+
+                        # D. Transcrições (gravadas em lote, fora do loop de voz)
+                        elif evt_type == "conversation.item.input_audio_transcription.completed":
+                            history_writer.add(student_id, "user", event.get("transcript", ""))
+
+                        # Resposta do tutor: só depois de saber quanto dela o aluno ouviu
+                        elif evt_type == "response.audio_transcript.done":
+                            item_id = event.get("item_id")
+                            transcript = event.get("transcript", "")
+                            if item_id in playback["heard"]:
+                                store_assistant_transcript(transcript, playback["heard"].pop(item_id))
+                            elif playback["cancelled"] and event.get("response_id") == playback["cancelled"]:
+                                pass  # cancelada antes de tocar qualquer áudio deste item
+                            else:
+                                playback["transcripts"][item_id] = transcript
+
+                        # E. Erros
                         elif evt_type == "error":
                             log_error(f"❌ OpenAI Erro: {event.get('error', {}).get('message')}")
 
                 except Exception as e:
                     log_error(f"Erro OpenAI->Client: {e}")
 
-            await asyncio.gather(receive_from_client(), receive_from_openai())
+            # Qualquer tarefa que termine (desconexão, erro, fila estourada)
+            # encerra a sessão inteira.
+            tasks = [
+                asyncio.create_task(receive_from_client()),
+                asyncio.create_task(receive_from_openai()),
+                asyncio.create_task(upstream.run()),
+                asyncio.create_task(downstream.run()),
+                asyncio.create_task(chunker.run()),
+                asyncio.create_task(pacer.run()),
+                asyncio.create_task(tool_runner.run()),
+            ]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception():
+                        log_error(f"Relay encerrado: {task.exception()}")
+            finally:
+                _active_channels.difference_update((upstream, downstream))
+                settle_transcripts()
+                history_writer.request_flush()
+                tool_runner.close()
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                log_info(
+                    "📊 Sessão encerrada",
+                    event="session_stats",
+                    **totals,
+                    upstream=upstream.stats(),
+                    downstream=downstream.stats(),
+                    vad=vad_gate.stats() if vad_gate else None,
+                    pacer=pacer.stats(),
+                )
 
     except Exception as e:
+        context_task.cancel()
         log_error(f"Falha na conexão OpenAI: {e}")
-        await websocket.close(code=1011)
\ No newline at end of file
+        await websocket.close(code=1011)
+    finally:
+        _active_sessions.discard(websocket)
@@ -0,0 +1,226 @@
+# metrics.py
+"""
+Métricas em memória do nó, expostas no formato texto do Prometheus em /metrics.
+Implementação mínima (contadores, histogramas e gauges) para não depender
+de prometheus_client.
+"""
+import asyncio
+import bisect
+
+from logger import log_warn
+
+# Buckets padrão em segundos (latências de voz: de ms a alguns segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _label_str(labelnames, values, extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self.labels()  # métrica sem labels aparece zerada desde o início
+        _registry.append(self)
+
+    def _new_child(self):
+        return None
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_label_str(self.labelnames, values)} {_fmt(child.value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, doc, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, child.counts):
+            cumulative += n
+            le = _label_str(self.labelnames, values, f'le="{_fmt(bound)}"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        le = _label_str(self.labelnames, values, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{le} {child.count}")
+        labels = _label_str(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_fmt(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge calculado na hora da coleta (função sem argumentos)."""
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, func):
+        super().__init__(name, doc)
+        self.func = func
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            lines.append(f"{self.name} {_fmt(self.func())}")
+        except Exception as e:
+            log_warn(f"Métrica {self.name} indisponível: {e}")
+        return lines
+
+
+class CounterFunc(Gauge):
+    """Contador mantido fora do registro (ex.: pool do banco), lido na coleta."""
+    kind = "counter"
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==========================================
+# MÉTRICAS DO RELAY DE VOZ
+# ==========================================
+UPSTREAM_CONNECT_SECONDS = Histogram(
+    "aia_upstream_connect_seconds",
+    "Tempo para obter a conexão com a Realtime API (pool ou conexão nova).",
+)
+TIME_TO_FIRST_AUDIO_SECONDS = Histogram(
+    "aia_time_to_first_audio_seconds",
+    "Do input_audio_buffer.speech_started ao primeiro response.audio.delta do turno.",
+)
+RESPONSE_LATENCY_SECONDS = Histogram(
+    "aia_response_latency_seconds",
+    "Do input_audio_buffer.speech_stopped ao primeiro response.audio.delta do turno.",
+)
+TOOL_DURATION_SECONDS = Histogram(
+    "aia_tool_duration_seconds",
+    "Duração de execute_tool por tool.",
+    labelnames=("tool",),
+)
+RELAY_BYTES = Counter(
+    "aia_relay_bytes_total",
+    "Bytes de áudio relayados por direção.",
+    labelnames=("direction",),
+)
+RELAY_FRAMES = Counter(
+    "aia_relay_frames_total",
+    "Mensagens de áudio relayadas por direção.",
+    labelnames=("direction",),
+)
+VAD_SUPPRESSED_BYTES = Counter(
+    "aia_vad_suppressed_bytes_total",
+    "Bytes de áudio do microfone descartados pelo gate de voz (silêncio).",
+)
+VAD_SILERO_FALLBACK_FRAMES = Counter(
+    "aia_vad_silero_fallback_frames_total",
+    "Frames decididos pelo detector de energia porque a fila do Silero estava atrasada.",
+)
+BARGE_IN_TOTAL = Counter(
+    "aia_barge_in_total",
+    "Interrupções do tutor pela fala do aluno (speech_started).",
+)
+CANCELLED_DELTAS_TOTAL = Counter(
+    "aia_cancelled_audio_deltas_total",
+    "response.audio.delta de respostas canceladas descartados no servidor.",
+)
+SESSIONS_TOTAL = Counter(
+    "aia_sessions_total",
+    "Sessões /ws aceitas.",
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "aia_event_loop_lag_seconds",
+    "Atraso do event loop medido por um timer periódico.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+UPLINK = "client_to_upstream"
+DOWNLINK = "upstream_to_client"
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Mede quanto um sleep(interval) atrasa além do esperado."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(loop.time() - start - interval, 0.0))
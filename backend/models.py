@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, String, Text, DateTime, func
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -26,3 +26,31 @@ class Lesson(Base):
     content = Column(Text, nullable=False)
     embedding = Column(Vector(1536))  # para RAG no futuro
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ConversationHistory(Base):
+    __tablename__ = "conversation_history"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    student_id = Column(String, ForeignKey("students.id", ondelete="CASCADE"))
+    message_type = Column(Text, nullable=False)  # "user" | "assistant"
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class LongMemory(Base):
+    __tablename__ = "long_memory"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    student_id = Column(String, ForeignKey("students.id", ondelete="CASCADE"))
+    memory = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class LessonEmbedding(Base):
+    __tablename__ = "lesson_embeddings"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    lesson_id = Column(UUID(as_uuid=True), ForeignKey("lessons.id", ondelete="CASCADE"))
+    content = Column(Text, nullable=True)  # trecho da lição
+    chunk_index = Column(Integer, nullable=True)
+    content_hash = Column(Text, nullable=True)  # sha256 do trecho
+    embedding = Column(Vector(1536))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,179 @@
+# realtime_pool.py
+import asyncio
+import json
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import websockets
+
+from logger import log_info, log_warn, log_error
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_REALTIME_URL,
+    REALTIME_POOL_SIZE,
+    REALTIME_POOL_MAX_IDLE_S,
+    REALTIME_POOL_REFILL_INTERVAL_S,
+)
+
+
+def realtime_url(model: str) -> str:
+    return f"{OPENAI_REALTIME_URL}?model={model}"
+
+
+class RealtimeConnectionPool:
+    """
+    Mantém `size` conexões já abertas (TLS + handshake WebSocket + session.update
+    base) com a Realtime API de um modelo, prontas para entregar no /ws.
+
+    - Conexões fechadas ou ociosas há mais de `max_idle_s` são descartadas.
+    - Uma tarefa em background (`run`) repõe o pool sempre que uma conexão sai.
+    - Se o pool estiver vazio, `acquire` abre uma conexão na hora (sem fila).
+    As conexões não voltam ao pool: cada sessão da OpenAI é de um aluno só.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        base_session: dict = None,
+        size: int = REALTIME_POOL_SIZE,
+        max_idle_s: float = REALTIME_POOL_MAX_IDLE_S,
+        refill_interval_s: float = REALTIME_POOL_REFILL_INTERVAL_S,
+    ):
+        self.model = model
+        self.url = realtime_url(model)
+        self.base_session = base_session
+        self.size = size
+        self.max_idle_s = max_idle_s
+        self.refill_interval_s = refill_interval_s
+
+        self._idle = deque()  # (ws, opened_at)
+        self._opening = 0
+        self._refill = asyncio.Event()
+        self._task = None
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "size": self.size,
+            "idle": self.idle,
+            "opening": self._opening,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    async def _open(self):
+        headers = {
+            "Authorization": f"Bearer {OPENAI_API_KEY}",
+            "OpenAI-Beta": "realtime=v1",
+        }
+        ws = await websockets.connect(self.url, extra_headers=headers)
+        if self.base_session:
+            await ws.send(json.dumps({"type": "session.update", "session": self.base_session}))
+        return ws
+
+    def _is_fresh(self, ws, opened_at: float) -> bool:
+        return ws.open and (time.monotonic() - opened_at) < self.max_idle_s
+
+    async def acquire(self):
+        """Entrega uma conexão pronta (do pool, ou aberta na hora)."""
+        while self._idle:
+            ws, opened_at = self._idle.popleft()
+            if self._is_fresh(ws, opened_at):
+                self.hits += 1
+                self._refill.set()
+                return ws
+            asyncio.create_task(ws.close())
+
+        self.misses += 1
+        self._refill.set()
+        return await self._open()
+
+    @asynccontextmanager
+    async def connection(self):
+        ws = await self.acquire()
+        try:
+            yield ws
+        finally:
+            await ws.close()
+
+    async def run(self):
+        """Mantém o pool cheio e sem conexões velhas."""
+        if self.size <= 0:
+            return
+        log_info(f"🔥 Pool Realtime ({self.model}): aquecendo {self.size} conexões...")
+
+        while True:
+            # Limpa antes de medir: um checkout durante o gather deixa o evento
+            # setado e a próxima volta repõe na hora
+            self._refill.clear()
+            self._prune()
+            missing = self.size - len(self._idle) - self._opening
+            if missing > 0:
+                await asyncio.gather(*(self._add_one() for _ in range(missing)))
+
+            try:
+                await asyncio.wait_for(self._refill.wait(), timeout=self.refill_interval_s)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _add_one(self):
+        self._opening += 1
+        try:
+            ws = await self._open()
+            self._idle.append((ws, time.monotonic()))
+        except Exception as e:
+            log_warn(f"Pool Realtime: falha ao pré-abrir conexão: {e}")
+            # Evita martelar a API se ela estiver fora
+            await asyncio.sleep(self.refill_interval_s)
+        finally:
+            self._opening -= 1
+
+    def _prune(self):
+        fresh = deque()
+        for ws, opened_at in self._idle:
+            if self._is_fresh(ws, opened_at):
+                fresh.append((ws, opened_at))
+            else:
+                asyncio.create_task(ws.close())
+        self._idle = fresh
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        while self._idle:
+            ws, _ = self._idle.popleft()
+            try:
+                await ws.close()
+            except Exception as e:
+                log_error(f"Pool Realtime: erro ao fechar conexão: {e}")
+
+
+# Um pool por modelo
+_pools = {}
+
+
+def get_realtime_pool(model: str, base_session: dict = None) -> RealtimeConnectionPool:
+    pool = _pools.get(model)
+    if pool is None:
+        pool = RealtimeConnectionPool(model, base_session=base_session)
+        _pools[model] = pool
+    return pool
+
+
+async def close_realtime_pools():
+    for pool in _pools.values():
+        await pool.close()
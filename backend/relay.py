@@ -0,0 +1,125 @@
+# relay.py
+import asyncio
+from collections import deque
+
+from logger import log_warn
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_BLOCK = "block"
+POLICY_DISCONNECT = "disconnect"
+POLICIES = (POLICY_DROP_OLDEST, POLICY_BLOCK, POLICY_DISCONNECT)
+
+
+class RelayOverflow(Exception):
+    """Fila cheia com a política 'disconnect'."""
+    pass
+
+
+class RelayChannel:
+    """
+    Fila limitada + tarefa escritora para UMA direção do relay
+    (cliente -> OpenAI ou OpenAI -> cliente).
+
+    Quem lê de um socket só enfileira; quem escreve no outro socket é a
+    tarefa `run()`. Assim um par lento não trava o outro lado.
+
+    Política quando a fila enche:
+    - drop_oldest: descarta o item de áudio (droppable) mais antigo.
+    - block: quem enfileira espera abrir espaço.
+    - disconnect: levanta RelayOverflow (a sessão é encerrada).
+
+    Mensagens de controle (droppable=False) nunca são descartadas; com
+    urgent=True elas furam a fila (ex.: "interrupt" no barge-in).
+    """
+
+    def __init__(self, name: str, send, maxsize: int, policy: str = POLICY_DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de fila inválida para '{name}': {policy}")
+
+        self.name = name
+        self.send = send
+        self.maxsize = maxsize
+        self.policy = policy
+
+        self._items = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+        # Métricas
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
+
+    async def put(self, payload, droppable: bool = False, urgent: bool = False):
+        if urgent:
+            self._items.appendleft((payload, droppable))
+            self._wake()
+            return
+
+        while len(self._items) >= self.maxsize:
+            if self.policy == POLICY_DISCONNECT:
+                raise RelayOverflow(f"Fila '{self.name}' cheia ({self.maxsize})")
+
+            if self.policy == POLICY_DROP_OLDEST:
+                if not self._drop_oldest():
+                    break  # só há controle na fila: aceita passar do limite
+                continue
+
+            self._not_full.clear()
+            await self._not_full.wait()
+
+        self._items.append((payload, droppable))
+        self._wake()
+
+    def clear_droppable(self) -> int:
+        """Remove todo o áudio pendente (mantém mensagens de controle)."""
+        before = len(self._items)
+        self._items = deque(item for item in self._items if not item[1])
+        removed = before - len(self._items)
+        if removed:
+            self._not_full.set()
+        return removed
+
+    async def run(self):
+        """Tarefa escritora: envia os itens na ordem até a conexão cair."""
+        while True:
+            if not self._items:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+                continue
+
+            payload, _ = self._items.popleft()
+            self._not_full.set()
+            await self.send(payload)
+            self.sent += 1
+
+    def _wake(self):
+        depth = len(self._items)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        self._not_empty.set()
+
+    def _drop_oldest(self) -> bool:
+        for i, (_, droppable) in enumerate(self._items):
+            if droppable:
+                del self._items[i]
+                if self.dropped == 0:
+                    log_warn(f"⚠️ Fila '{self.name}' cheia - descartando áudio antigo.")
+                self.dropped += 1
+                return True
+        return False
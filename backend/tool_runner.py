@@ -0,0 +1,126 @@
+# tool_runner.py
+import asyncio
+import json
+import time
+from collections import deque
+
+from logger import log_info, log_warn, log_error
+from config import TOOL_TIMEOUT_S, TOOL_TIMEOUTS
+from metrics import TOOL_DURATION_SECONDS
+
+
+class ToolCallRunner:
+    """
+    Executa as tools pedidas pela IA fora do loop de áudio de uma sessão.
+
+    - Cada chamada vira uma tarefa própria, com timeout por tool.
+    - As respostas (function_call_output) voltam na MESMA ordem das chamadas;
+      depois da última pendente, pede um novo response.create.
+    - No barge-in, `cancel_all` cancela o que ainda está rodando: o aluno
+      já mudou de assunto e a nova fala vai gerar a próxima resposta.
+    """
+
+    def __init__(self, execute, student_id: str, send):
+        self.execute = execute
+        self.student_id = student_id
+        self.send = send
+
+        self._pending = deque()  # (call_id, name, task)
+        self._wakeup = asyncio.Event()
+        self._answered = False  # alguma tool do lote atual respondeu
+        self._interrupted = set()  # call_ids pendentes durante um barge-in
+
+        # Métricas
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def submit(self, call_id: str, name: str, raw_args: str):
+        log_info(f"🤖 Executando Tool: {name}", event="tool_call", tool=name)
+        task = asyncio.create_task(self._execute(name, raw_args))
+        self._pending.append((call_id, name, task))
+        self._wakeup.set()
+
+    def cancel_all(self) -> int:
+        # A fala nova do aluno já vai gerar a próxima resposta
+        self._answered = False
+        count = 0
+        for call_id, _, task in self._pending:
+            # Mesmo a tool que já terminou não pode mais disparar response.create
+            self._interrupted.add(call_id)
+            if task.cancel():
+                count += 1
+        if count:
+            log_info(f"🛑 {count} tool(s) cancelada(s) pelo barge-in.", event="tool_cancel")
+        return count
+
+    async def _execute(self, name: str, raw_args: str) -> str:
+        timeout = TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT_S)
+        start = time.perf_counter()
+        try:
+            args = json.loads(raw_args or "{}")
+            result = await asyncio.wait_for(
+                self.execute(name, args, self.student_id), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            log_warn(f"⏱️ Tool {name} excedeu {timeout}s", event="tool_timeout", tool=name)
+            result = {"error": "A consulta demorou demais. Continue sem essa informação."}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_error(f"Erro na tool {name}: {e}")
+            result = {"error": "Falha ao executar a ferramenta."}
+        finally:
+            TOOL_DURATION_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+        # A Realtime API espera string no output
+        return result if isinstance(result, str) else json.dumps(result)
+
+    async def run(self):
+        """Envia os resultados em ordem, à medida que ficam prontos."""
+        while True:
+            if not self._pending:
+                # Lote encerrado: só pede nova resposta se alguma tool respondeu
+                if self._answered:
+                    self._answered = False
+                    await self.send(json.dumps({"type": "response.create"}))
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            call_id, name, task = self._pending[0]
+            # asyncio.wait não propaga o cancelamento da tarefa da tool
+            await asyncio.wait({task})
+            self._pending.popleft()
+            interrupted = call_id in self._interrupted
+            self._interrupted.discard(call_id)
+
+            if task.cancelled():
+                self.cancelled += 1
+                output = json.dumps({"error": "Cancelada: o aluno interrompeu."})
+            else:
+                self.completed += 1
+                if not interrupted:
+                    self._answered = True
+                output = task.result()
+
+            # Devolve o resultado para a IA
+            await self.send(json.dumps({
+                "type": "conversation.item.create",
+                "item": {
+                    "type": "function_call_output",
+                    "call_id": call_id,
+                    "output": output
+                }
+            }))
+
+    def close(self):
+        for _, _, task in self._pending:
+            task.cancel()
+        self._pending.clear()
+        self._interrupted.clear()
@@ -0,0 +1,262 @@
+# vad_gate.py
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_ingest import ms_to_bytes
+from logger import log_info, log_warn
+from metrics import VAD_SUPPRESSED_BYTES, VAD_SILERO_FALLBACK_FRAMES
+from config import (
+    REALTIME_SAMPLE_RATE,
+    SERVER_VAD_GATE,
+    VAD_FRAME_MS,
+    VAD_PREROLL_MS,
+    VAD_HANGOVER_MS,
+    VAD_ENERGY_DBFS,
+    VAD_ZCR_MAX,
+    VAD_SILERO_THRESHOLD,
+    VAD_SILERO_MODEL,
+    VAD_SILERO_THREADS,
+    VAD_SILERO_MAX_LAG_MS,
+)
+
+
+class EnergyDetector:
+    """
+    Energia (dBFS) + taxa de cruzamentos por zero, vetorizado em NumPy para
+    todos os frames de uma vez. Ruído de fundo é baixo em energia; chiado
+    (ventilador, estática) tem muitos cruzamentos por zero e só passa se for alto.
+    """
+
+    frame_ms = VAD_FRAME_MS
+
+    def __init__(self, threshold_dbfs: float = VAD_ENERGY_DBFS, zcr_max: float = VAD_ZCR_MAX):
+        self.threshold_dbfs = threshold_dbfs
+        self.zcr_max = zcr_max
+
+    async def detect(self, frames: np.ndarray) -> np.ndarray:
+        """frames: (n, amostras) int16 -> (n,) bool."""
+        x = frames.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(x * x, axis=1))
+        dbfs = 20 * np.log10(np.maximum(rms, 1e-9))
+        zcr = np.mean(np.signbit(x[:, 1:]) != np.signbit(x[:, :-1]), axis=1)
+        loud = dbfs > self.threshold_dbfs
+        return loud & ((zcr < self.zcr_max) | (dbfs > self.threshold_dbfs + 10))
+
+
+# Sessão ONNX compartilhada por todas as conexões (o estado h/c fica em cada detector)
+_silero_session = None
+_silero_threads = VAD_SILERO_THREADS or max(1, (os.cpu_count() or 2) // 2)
+_silero_executor = ThreadPoolExecutor(max_workers=_silero_threads, thread_name_prefix="silero-vad")
+# Frames na fila/rodando no executor (todas as sessões) e custo médio de um frame
+_silero_backlog = {"frames": 0, "frame_s": 0.001}
+
+
+def silero_lag_ms() -> float:
+    """Espera estimada de um frame novo na fila do Silero."""
+    return _silero_backlog["frames"] * _silero_backlog["frame_s"] / _silero_threads * 1000
+
+
+def _get_silero_session(model_path: str = VAD_SILERO_MODEL):
+    global _silero_session
+    if _silero_session is None:
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("SERVER_VAD_GATE=silero requer o pacote onnxruntime")
+        if not os.path.exists(model_path):
+            raise RuntimeError(f"Modelo Silero VAD não encontrado: {model_path}")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        _silero_session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        log_info(f"🎙️ Modelo Silero VAD carregado: {model_path} ({_silero_threads} thread(s))")
+    return _silero_session
+
+
+class SileroDetector:
+    """
+    Silero VAD (modelo legado: entradas input/sr/h/c) em CPU via onnxruntime.
+    O modelo roda a 16 kHz em janelas de 512 amostras: cada frame de 32 ms a
+    24 kHz (768 amostras) é reamostrado para 512. A inferência roda num pool
+    de threads para não ocupar o event loop.
+
+    Com muitas sessões, se a fila do pool passar de VAD_SILERO_MAX_LAG_MS, os
+    frames daquele momento são decididos pelo EnergyDetector: o gate perde um
+    pouco de precisão, mas não acumula atraso sobre o tempo real.
+    """
+
+    frame_ms = 32
+    model_rate = 16000
+    window = 512
+
+    def __init__(self, threshold: float = VAD_SILERO_THRESHOLD, sample_rate: int = REALTIME_SAMPLE_RATE):
+        self.threshold = threshold
+        self.session = _get_silero_session()
+        self._h = np.zeros((2, 1, 64), dtype=np.float32)
+        self._c = np.zeros((2, 1, 64), dtype=np.float32)
+        self._sr = np.array(self.model_rate, dtype=np.int64)
+        n_in = int(sample_rate * self.frame_ms / 1000)
+        self._positions = np.arange(self.window) * (n_in / self.window)
+        self._grid = np.arange(n_in)
+        self._energy = EnergyDetector()
+        self.fallback_frames = 0
+
+    def _run(self, frames: np.ndarray) -> np.ndarray:
+        start = time.perf_counter()
+        speech = np.zeros(len(frames), dtype=bool)
+        for i, frame in enumerate(frames):
+            x = np.interp(self._positions, self._grid, frame.astype(np.float32) / 32768.0)
+            out, self._h, self._c = self.session.run(None, {
+                "input": x.astype(np.float32)[None, :],
+                "sr": self._sr,
+                "h": self._h,
+                "c": self._c,
+            })
+            speech[i] = out[0][0] >= self.threshold
+        if len(frames):
+            per_frame = (time.perf_counter() - start) / len(frames)
+            _silero_backlog["frame_s"] = 0.9 * _silero_backlog["frame_s"] + 0.1 * per_frame
+        return speech
+
+    async def detect(self, frames: np.ndarray) -> np.ndarray:
+        if silero_lag_ms() > VAD_SILERO_MAX_LAG_MS:
+            self.fallback_frames += len(frames)
+            VAD_SILERO_FALLBACK_FRAMES.inc(len(frames))
+            return await self._energy.detect(frames)
+
+        loop = asyncio.get_running_loop()
+        _silero_backlog["frames"] += len(frames)
+        try:
+            return await loop.run_in_executor(_silero_executor, self._run, frames)
+        finally:
+            _silero_backlog["frames"] -= len(frames)
+
+
+# Detector efetivo do processo: vira "energy" se o Silero não puder ser carregado
+_gate_mode = SERVER_VAD_GATE
+
+
+def make_detector(mode: str = None):
+    global _gate_mode
+    mode = mode or _gate_mode
+    if mode == "energy":
+        return EnergyDetector()
+    if mode == "silero":
+        try:
+            return SileroDetector()
+        except Exception as e:
+            log_warn(f"⚠️ Silero VAD indisponível ({e}); usando o detector de energia.")
+            _gate_mode = "energy"
+            return EnergyDetector()
+    raise ValueError(f"SERVER_VAD_GATE desconhecido: {mode}")
+
+
+def prepare_vad_gate(mode: str = SERVER_VAD_GATE) -> str:
+    """
+    Startup: valida SERVER_VAD_GATE e carrega o modelo antes da primeira
+    sessão, para um erro de configuração não derrubar cada /ws em runtime.
+    """
+    if mode != "off":
+        make_detector(mode)
+    return _gate_mode if mode != "off" else mode
+
+
+class VoiceActivityGate:
+    """
+    Portão de voz antes do AudioChunker: o áudio só segue para a OpenAI
+    enquanto há fala.
+
+    - Frames de silêncio ficam num pré-roll (`preroll_ms`); quando a fala
+      começa, o pré-roll vai junto, para o server VAD não cortar o início.
+    - Depois da última fala, o portão fica aberto por `hangover_ms` (maior que
+      o silence_duration_ms do server VAD), para o turno fechar normalmente.
+    - O resto é descartado e contabilizado em `suppressed_bytes`.
+    """
+
+    def __init__(
+        self,
+        on_audio,
+        detector=None,
+        preroll_ms: int = VAD_PREROLL_MS,
+        hangover_ms: int = VAD_HANGOVER_MS,
+        sample_rate: int = REALTIME_SAMPLE_RATE,
+    ):
+        self.on_audio = on_audio
+        self.detector = detector or make_detector()
+        self.frame_bytes = ms_to_bytes(self.detector.frame_ms, sample_rate)
+        self.hangover_frames = max(1, -(-hangover_ms // self.detector.frame_ms))
+
+        self._pending = bytearray()  # resto que ainda não fecha um frame
+        self._preroll = deque(maxlen=max(1, preroll_ms // self.detector.frame_ms))
+        self._open = False
+        self._hang = 0
+
+        # Métricas simples
+        self.passed_bytes = 0
+        self.suppressed_bytes = 0
+        self.openings = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._open
+
+    async def push(self, data: bytes):
+        if not data:
+            return
+        self._pending.extend(data)
+        n_frames = len(self._pending) // self.frame_bytes
+        if n_frames == 0:
+            return
+
+        size = n_frames * self.frame_bytes
+        raw = bytes(self._pending[:size])
+        del self._pending[:size]
+
+        frames = np.frombuffer(raw, dtype=np.int16).reshape(n_frames, -1)
+        speech = await self.detector.detect(frames)
+
+        out = bytearray()
+        suppressed = 0
+        for i, is_speech in enumerate(speech):
+            frame = raw[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            if is_speech:
+                if not self._open:
+                    self._open = True
+                    self.openings += 1
+                    for buffered in self._preroll:
+                        out.extend(buffered)
+                    self._preroll.clear()
+                self._hang = self.hangover_frames
+                out.extend(frame)
+            elif self._open:
+                out.extend(frame)
+                self._hang -= 1
+                if self._hang <= 0:
+                    self._open = False
+            else:
+                if len(self._preroll) == self._preroll.maxlen:
+                    suppressed += len(self._preroll[0])
+                self._preroll.append(frame)
+
+        if suppressed:
+            self.suppressed_bytes += suppressed
+            VAD_SUPPRESSED_BYTES.inc(suppressed)
+        if out:
+            self.passed_bytes += len(out)
+            await self.on_audio(bytes(out))
+
+    def stats(self) -> dict:
+        return {
+            "passed_bytes": self.passed_bytes,
+            "suppressed_bytes": self.suppressed_bytes,
+            "openings": self.openings,
+            "open": self._open,
+            "fallback_frames": getattr(self.detector, "fallback_frames", 0),
+        }